@@ -1,9 +1,9 @@
 import locale
+import multiprocessing
 import os
 import re
 import sys
 
-from PIL import Image
 from PySide6.QtCore import QDir, QSettings, Qt, QTranslator
 from PySide6.QtGui import QAction, QPixmap
 from PySide6.QtWidgets import (
@@ -22,6 +22,7 @@ from PySide6.QtWidgets import (
 )
 
 from src import AssetManager, DecodeHelper, EncodeHelper, IconViewer
+from src.utility import configure_cache, open_img
 
 
 class AzurLaneTachieHelper(QMainWindow):
@@ -52,6 +53,9 @@ class AzurLaneTachieHelper(QMainWindow):
         self.dump_layer = self._get_conf_bool("Edit/DumpLayer", False)
         self.adv_mode = self._get_conf_bool("Edit/AdvancedMode", False)
         self.replace_icon = self._get_conf_bool("Edit/ReplaceIcon", False)
+        self.cache_dir = str(self.settings.value("Cache/Dir", os.path.join(os.getcwd(), "cache")))
+        self.texture_cache = self._get_conf_bool("Cache/Texture", True)
+        configure_cache(self.cache_dir, self.texture_cache)
 
     def _layout_ab_dep(self):  # Layout for Assetbundle Dependencies
         label = QLabel(self.tr("Assetbundle Dependencies"))
@@ -60,13 +64,9 @@ class AzurLaneTachieHelper(QMainWindow):
         self.tDep = QTableWidget()
         self.tDep.setColumnCount(2)
         self.tDep.setHorizontalHeaderLabels([self.tr("Part Name"), self.tr("Full Path")])
-        self.tDep.horizontalHeader().setSectionResizeMode(
-            0, QHeaderView.ResizeMode.ResizeToContents
-        )
+        self.tDep.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)
         self.tDep.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
-        self.tDep.setSizePolicy(
-            QSizePolicy.Policy.MinimumExpanding, QSizePolicy.Policy.MinimumExpanding
-        )
+        self.tDep.setSizePolicy(QSizePolicy.Policy.MinimumExpanding, QSizePolicy.Policy.MinimumExpanding)
 
         layout = QVBoxLayout()
         layout.addWidget(label)
@@ -81,13 +81,9 @@ class AzurLaneTachieHelper(QMainWindow):
         self.tPaintRepl = QTableWidget()
         self.tPaintRepl.setColumnCount(2)
         self.tPaintRepl.setHorizontalHeaderLabels([self.tr("Target"), self.tr("Image Source")])
-        self.tPaintRepl.horizontalHeader().setSectionResizeMode(
-            0, QHeaderView.ResizeMode.ResizeToContents
-        )
+        self.tPaintRepl.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)
         self.tPaintRepl.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
-        self.tPaintRepl.setSizePolicy(
-            QSizePolicy.Policy.MinimumExpanding, QSizePolicy.Policy.MinimumExpanding
-        )
+        self.tPaintRepl.setSizePolicy(QSizePolicy.Policy.MinimumExpanding, QSizePolicy.Policy.MinimumExpanding)
 
         layout = QVBoxLayout()
         layout.addWidget(label)
@@ -102,13 +98,9 @@ class AzurLaneTachieHelper(QMainWindow):
         self.tFaceRepl = QTableWidget()
         self.tFaceRepl.setColumnCount(2)
         self.tFaceRepl.setHorizontalHeaderLabels([self.tr("Clip"), self.tr("Image Source")])
-        self.tFaceRepl.horizontalHeader().setSectionResizeMode(
-            0, QHeaderView.ResizeMode.ResizeToContents
-        )
+        self.tFaceRepl.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)
         self.tFaceRepl.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
-        self.tFaceRepl.setSizePolicy(
-            QSizePolicy.Policy.MinimumExpanding, QSizePolicy.Policy.MinimumExpanding
-        )
+        self.tFaceRepl.setSizePolicy(QSizePolicy.Policy.MinimumExpanding, QSizePolicy.Policy.MinimumExpanding)
 
         layout = QVBoxLayout()
         layout.addWidget(label)
@@ -275,9 +267,7 @@ class AzurLaneTachieHelper(QMainWindow):
 
     def onClickFileImportPainting(self):
         last = os.path.dirname(self.settings.value("File/RecentPath", ""))
-        files, _ = QFileDialog.getOpenFileNames(
-            self, self.tr("Select Paintings"), last, "Image (*.png)"
-        )
+        files, _ = QFileDialog.getOpenFileNames(self, self.tr("Select Paintings"), last, "Image (*.png *.npy)")
         if files:
             print("[INFO] Paintings:")
 
@@ -323,9 +313,7 @@ class AzurLaneTachieHelper(QMainWindow):
 
     def onClickFileImportIcons(self):
         last = os.path.dirname(self.settings.value("File/RecentPath", ""))
-        files, _ = QFileDialog.getOpenFileNames(
-            self, self.tr("Select Icons"), last, "Image (*.png)"
-        )
+        files, _ = QFileDialog.getOpenFileNames(self, self.tr("Select Icons"), last, "Image (*.png *.npy)")
         if files:
             print("[INFO] Icons:")
 
@@ -333,15 +321,13 @@ class AzurLaneTachieHelper(QMainWindow):
                 name, _ = os.path.splitext(os.path.basename(file))
                 if name in ["shipyardicon", "squareicon", "herohrzicon"]:
                     print("      ", QDir.toNativeSeparators(file))
-                    self.asset_manager.repls[name] = Image.open(file)
+                    self.asset_manager.repls[name] = open_img(file)
 
             self.aEditEncodeTexture.setEnabled(True)
 
     def onClickEditClip(self):
         last = os.path.dirname(self.settings.value("File/RecentPath", ""))
-        file, _ = QFileDialog.getOpenFileName(
-            self, self.tr("Select Reference"), last, "Image (*.png)"
-        )
+        file, _ = QFileDialog.getOpenFileName(self, self.tr("Select Reference"), last, "Image (*.png *.npy)")
         if file:
             viewer = IconViewer(self.asset_manager.icons, *self.asset_manager.prepare_icon(file))
             if viewer.exec():
@@ -359,9 +345,7 @@ class AzurLaneTachieHelper(QMainWindow):
         last = os.path.dirname(self.settings.value("File/RecentPath", ""))
         dir = QFileDialog.getExistingDirectory(self, dir=last)
         if dir:
-            is_clip = {
-                k: v.checkState() != Qt.CheckState.Unchecked for k, v in self.check_box.items()
-            }
+            is_clip = {k: v.checkState() != Qt.CheckState.Unchecked for k, v in self.check_box.items()}
             res = self.encoder.exec(dir, self.replace_icon, self.adv_mode, is_clip)
             self.show_path("\n".join([QDir.toNativeSeparators(_) for _ in res]))
 
@@ -386,6 +370,7 @@ class AzurLaneTachieHelper(QMainWindow):
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
 
     path = os.path.join("i18n", locale.getdefaultlocale()[0] + ".qm")
@@ -0,0 +1,40 @@
+import argparse
+import os
+
+from src.AssetCatalog import AssetCatalog
+
+parser = argparse.ArgumentParser()
+parser.add_argument("root", help="Root of the extracted AssetBundles tree")
+parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Number of workers")
+parser.add_argument("-n", "--no-refresh", action="store_true", help="Query without rescanning")
+parser.add_argument("-u", "--users", help="List bundles depending on this bundle")
+parser.add_argument("-d", "--deps", help="List dependencies of this bundle")
+parser.add_argument("-f", "--find", help="List bundles containing this sprite or texture")
+parser.add_argument("-m", "--missing", action="store_true", help="List unresolved dependencies")
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    catalog = AssetCatalog(args.root)
+    if not args.no_refresh:
+        changes = catalog.refresh(args.jobs)
+        for k, v in changes.items():
+            print(f"[INFO] {k.capitalize()}: {len(v)}")
+            [print("      ", _) for _ in v]
+
+    if args.users is not None:
+        print(f"[INFO] Users of {args.users}:")
+        [print("      ", _) for _ in catalog.users(args.users)]
+
+    if args.deps is not None:
+        print(f"[INFO] Dependencies of {args.deps}:")
+        [print("      ", _) for _ in catalog.deps(args.deps)]
+
+    if args.find is not None:
+        print(f"[INFO] Bundles containing {args.find}:")
+        [print("      ", _) for _ in catalog.find(args.find)]
+
+    if args.missing:
+        print("[INFO] Missing dependencies:")
+        for k, v in catalog.missing().items():
+            print("      ", k, "->", ", ".join(v))
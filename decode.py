@@ -0,0 +1,78 @@
+import argparse
+import glob
+import os
+import sys
+
+from src import AssetManager, DecodeHelper
+from src.utility import check_dir, configure_cache, run_batch, write_report
+
+
+def collect(inputs: list[str]) -> list[str]:
+    files = []
+    for x in inputs:
+        if os.path.isdir(x):
+            for y in sorted(os.listdir(x)):
+                path = os.path.join(x, y)
+                if os.path.isfile(path) and not y.endswith("_tex"):
+                    files += [path]
+        elif os.path.isfile(x):
+            files += [x]
+        else:
+            files += sorted(glob.glob(x))
+    return list(dict.fromkeys(files))
+
+
+def decode(
+    file: str, outdir: str, dump: bool, num_threads: int, compression: str, format: str, incremental: bool
+) -> str:
+    asset_manager = AssetManager()
+    try:
+        asset_manager.analyze(file, prefetch=True)
+
+        dir = outdir
+        if dump:
+            dir = os.path.join(outdir, asset_manager.name)
+            check_dir(dir)
+
+        return DecodeHelper(asset_manager).exec(
+            dir, dump, num_threads, compression=compression, format=format, incremental=incremental
+        )
+    finally:
+        asset_manager.release()
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("inputs", nargs="*", help="Metadata files, glob patterns or painting folders")
+parser.add_argument("-l", "--list", help="Text file listing one metadata per line")
+parser.add_argument("-o", "--outdir", default="output", help="Folder to write output into")
+parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Number of workers")
+parser.add_argument("-t", "--threads", type=int, default=1, help="Threads per skin")
+parser.add_argument("-d", "--dump", action="store_true", help="Dump intermediate layers")
+parser.add_argument("-f", "--format", choices=list(DecodeHelper.writers), default="psd", help="Layered output format")
+parser.add_argument("-c", "--compression", choices=["rle", "raw"], default="rle", help="PSD channel compression")
+parser.add_argument("-i", "--incremental", action="store_true", help="Reuse cached layers whose inputs are unchanged")
+parser.add_argument("-q", "--quiet", action="store_true", help="Mute per-skin logging")
+parser.add_argument("-r", "--report", help="Write a json summary into this file")
+parser.add_argument("--cache-dir", help="Folder to keep caches in (default: $ALTH_CACHE_DIR or ./cache)")
+parser.add_argument("--no-texture-cache", action="store_true", help="Decode textures without the on-disk cache")
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    configure_cache(args.cache_dir, False if args.no_texture_cache else None)
+
+    inputs = args.inputs
+    if args.list is not None:
+        with open(args.list, encoding="utf-8") as f:
+            inputs += [_.strip() for _ in f if _.strip() != ""]
+    files = collect(inputs)
+    if files == []:
+        parser.error("no metadata found")
+
+    check_dir(args.outdir)
+    print(f"[INFO] Decoding {len(files)} metadata with {args.jobs} workers")
+    tasks = {
+        x: (x, args.outdir, args.dump, args.threads, args.compression, args.format, args.incremental) for x in files
+    }
+    results = run_batch(decode, tasks, args.jobs, args.quiet)
+
+    sys.exit(0 if write_report(results, args.report) else 1)
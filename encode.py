@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+import re
+import sys
+
+from src import AssetManager, EncodeHelper
+from src.utility import configure_cache, open_img, run_batch, write_report
+
+
+def load_manifest(path: str) -> list[dict]:
+    with open(path, "rb") as f:
+        if os.path.splitext(path)[1].lower() == ".toml":
+            try:
+                import tomllib
+            except ImportError:
+                import tomli as tomllib
+
+            manifest = tomllib.load(f)
+        else:
+            manifest = json.load(f)
+
+    base = os.path.dirname(os.path.abspath(path))
+    defaults = {k: v for k, v in manifest.items() if k != "jobs"}
+    jobs = []
+    for x in manifest["jobs"]:
+        job = {
+            "meta": None,
+            "painting": None,
+            "face": None,
+            "icons": [],
+            "output": ".",
+            "adv_mode": False,
+            "replace_icon": False,
+            "clip": {},
+            "formats": {},
+            "quality": "normal",
+            "trim": False,
+            "trim_faces": False,
+        }
+        job |= defaults | x
+        assert job["meta"] is not None, f"Metadata not specified: {x}"
+        for k in ["meta", "painting", "face", "output"]:
+            if job[k] is not None:
+                job[k] = os.path.join(base, job[k])
+        if isinstance(job["icons"], str):
+            job["icons"] = [job["icons"]]
+        job["icons"] = [os.path.join(base, _) for _ in job["icons"]]
+        job["clip"] = {str(k): v for k, v in job["clip"].items()}
+        jobs += [job]
+    return jobs
+
+
+def encode(
+    meta: str,
+    painting: str,
+    face: str,
+    icons: list[str],
+    output: str,
+    adv_mode: bool,
+    replace_icon: bool,
+    clip: dict[str, bool],
+    formats: dict[str, str],
+    quality: str,
+    trim: bool,
+    trim_faces: bool,
+    num_workers: int = 1,
+    reuse: bool = True,
+) -> list[str]:
+    asset_manager = AssetManager()
+    try:
+        asset_manager.analyze(meta)
+
+        if painting is not None:
+            print("[INFO] Paintings:")
+            pics = {os.path.splitext(_)[0]: os.path.join(painting, _) for _ in os.listdir(painting)}
+            workload = {v: pics[v] for v in asset_manager.maps.values() if v in pics}
+            asset_manager.load_paintings(workload)
+
+        if face is not None:
+            print("[INFO] Paintingfaces:")
+            pics = {}
+            for file in os.listdir(face):
+                name, _ = os.path.splitext(file)
+                if re.match(r"^0|([1-9][0-9]*)$", name):
+                    pics[name] = os.path.join(face, file)
+            workload = {}
+            for x in asset_manager.faces:
+                assert x in pics, f"Paintingface not found: {x}"
+                workload[x] = pics[x]
+            asset_manager.load_faces(workload)
+
+        print("[INFO] Icons:")
+        for x in icons:
+            files = [os.path.join(x, _) for _ in os.listdir(x)] if os.path.isdir(x) else [x]
+            for file in files:
+                name, _ = os.path.splitext(os.path.basename(file))
+                if name in ["shipyardicon", "squareicon", "herohrzicon"]:
+                    print("      ", file)
+                    asset_manager.repls[name] = open_img(file)
+
+        is_clip = {x: clip.get(x, True) for x in asset_manager.faces}
+        return EncodeHelper(asset_manager).exec(
+            output, replace_icon, adv_mode, is_clip, num_workers, formats, quality, reuse, trim, trim_faces
+        )
+    finally:
+        asset_manager.release()
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument("manifest", help="Job manifest in json or toml")
+parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Number of workers")
+parser.add_argument("-t", "--threads", type=int, default=1, help="Bundle workers per skin")
+parser.add_argument("-n", "--no-cache", action="store_true", help="Re-encode bundles even if unchanged")
+parser.add_argument("-q", "--quiet", action="store_true", help="Mute per-skin logging")
+parser.add_argument("-r", "--report", help="Write a json summary into this file")
+parser.add_argument("--cache-dir", help="Folder to keep caches in (default: $ALTH_CACHE_DIR or ./cache)")
+parser.add_argument("--no-texture-cache", action="store_true", help="Decode textures without the on-disk cache")
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    configure_cache(args.cache_dir, False if args.no_texture_cache else None)
+
+    jobs = load_manifest(args.manifest)
+    print(f"[INFO] Encoding {len(jobs)} jobs with {args.jobs} workers")
+    keys = [
+        "meta",
+        "painting",
+        "face",
+        "icons",
+        "output",
+        "adv_mode",
+        "replace_icon",
+        "clip",
+        "formats",
+        "quality",
+        "trim",
+        "trim_faces",
+    ]
+    tasks = {f"{i}:{x['meta']}": (*[x[k] for k in keys], args.threads, not args.no_cache) for i, x in enumerate(jobs)}
+    results = run_batch(encode, tasks, args.jobs, args.quiet)
+
+    sys.exit(0 if write_report(results, args.report) else 1)
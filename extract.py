@@ -6,6 +6,7 @@ from UnityPy import Environment
 from UnityPy.classes import Sprite, Texture2D
 from UnityPy.enums import ClassIDType
 
+from src.TextureCache import cache
 from src.utility import check_dir
 
 suffix = {
@@ -29,7 +30,7 @@ def exec(ab: str):
 
         dst = os.path.join(outdir, f"{file}.png")
         print("[INFO] Dumping:", dst)
-        tex2d.image.save(dst)
+        cache.get(tex2d).save(dst)
 
 
 outdir = "loadingbg_img"
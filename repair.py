@@ -7,21 +7,24 @@ import UnityPy
 from PIL import Image
 from UnityPy import Environment
 from UnityPy.classes import TextAsset, Texture2D
-from UnityPy.enums import ClassIDType, TextureFormat
+from UnityPy.enums import TextureFormat
+
+from src.TextureCache import cache
+from src.utility import configure_cache, filter_env
 
 
 def get_skel(env: Environment) -> dict[str, TextAsset]:
-    skel: list[TextAsset] = [_.read() for _ in env.objects if _.type == ClassIDType.TextAsset]
+    skel: list[TextAsset] = filter_env(env, TextAsset)
     return {_.name.split(".")[0]: _ for _ in skel if _.name.endswith(".skel")}
 
 
 def get_atlas(env: Environment) -> dict[str, TextAsset]:
-    atlas: list[TextAsset] = [_.read() for _ in env.objects if _.type == ClassIDType.TextAsset]
+    atlas: list[TextAsset] = filter_env(env, TextAsset)
     return {_.name.split(".")[0]: _ for _ in atlas if _.name.endswith(".atlas")}
 
 
 def get_tex2d(env: Environment) -> dict[str, Texture2D]:
-    tex2d: list[Texture2D] = [_.read() for _ in env.objects if _.type == ClassIDType.Texture2D]
+    tex2d: list[Texture2D] = filter_env(env, Texture2D)
     return {_.name: _ for _ in tex2d}
 
 
@@ -45,11 +48,9 @@ def get_parts(atlas: TextAsset) -> tuple[tuple[int, int], dict[str, dict]]:
     }
 
 
-def get_rects(
-    atlas: TextAsset, tex2d: Texture2D
-) -> tuple[dict[str, Image.Image], tuple[int, int], dict[str, dict]]:
+def get_rects(atlas: TextAsset, tex2d: Texture2D) -> tuple[dict[str, Image.Image], tuple[int, int], dict[str, dict]]:
     shape, parts = get_parts(atlas)
-    img = tex2d.image
+    img = cache.get(tex2d)
     rects = {}
     for k, v in parts.items():
         rot, xy, size, orig, offset, idx = v.values()
@@ -68,9 +69,12 @@ def merge(*kv_list: dict):
 
 parser = argparse.ArgumentParser()
 parser.add_argument("path", type=str, help="Path to the folder containing old & new spine")
+parser.add_argument("--cache-dir", help="Folder to keep caches in (default: $ALTH_CACHE_DIR or ./cache)")
+parser.add_argument("--no-texture-cache", action="store_true", help="Decode textures without the on-disk cache")
 
 if __name__ == "__main__":
     args = parser.parse_args()
+    configure_cache(args.cache_dir, False if args.no_texture_cache else None)
 
     base = args.path.strip("\\/")
     print(f"[INFO] Base folder: {base}")
@@ -142,10 +146,7 @@ if __name__ == "__main__":
     mode = input("Recover Mode (1 for relocate, 2 for replace): ")
     assert mode in ["1", "2"], f"Unknow mode {mode}"
 
-    tasks = [
-        threading.Thread(target={"1": recover1, "2": recover2}[mode], args=(x,))
-        for x in old_atlas.keys()
-    ]
+    tasks = [threading.Thread(target={"1": recover1, "2": recover2}[mode], args=(x,)) for x in old_atlas.keys()]
     [_.start() for _ in tasks]
     [_.join() for _ in tasks]
 
@@ -0,0 +1,150 @@
+import contextlib
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
+import UnityPy
+from UnityPy.classes import AssetBundle, Sprite, Texture2D
+from UnityPy.enums import ClassIDType
+
+from .utility import cache_path, check_dir, filter_env
+
+
+def scan_bundle(path: str) -> dict:
+    env = UnityPy.load(path)
+    abs: list[AssetBundle] = filter_env(env, AssetBundle)
+    deps = [] if abs == [] else list(abs[0].m_Dependencies)
+    sprite = None
+    for x in env.container.values():
+        if x.type == ClassIDType.Sprite:
+            sprite = x.read().name
+    textures = [[_.name, _.m_Width, _.m_Height] for _ in filter_env(env, Texture2D)]
+    sprites = [[_.name, _.m_Rect.width, _.m_Rect.height] for _ in filter_env(env, Sprite)]
+    return {"deps": deps, "sprite": sprite, "textures": textures, "sprites": sprites}
+
+
+def _scan(path: str) -> dict:
+    try:
+        return scan_bundle(path)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+class AssetCatalog:
+    def __init__(self, root: str, path: str = None):
+        self.root = os.path.abspath(root)
+        self.path = cache_path("catalog.db") if path is None else path
+
+    @contextlib.contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        dir = os.path.dirname(self.path)
+        if dir != "":
+            check_dir(dir)
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            with con:
+                con.execute(
+                    "CREATE TABLE IF NOT EXISTS bundle "
+                    "(root TEXT, path TEXT, size INTEGER, mtime INTEGER, record TEXT, "
+                    "PRIMARY KEY (root, path))"
+                )
+                con.execute(
+                    "CREATE TABLE IF NOT EXISTS dep " "(root TEXT, path TEXT, dep TEXT, PRIMARY KEY (root, path, dep))"
+                )
+                con.execute("CREATE INDEX IF NOT EXISTS dep_index ON dep (root, dep)")
+                yield con
+        finally:
+            con.close()
+
+    def walk(self) -> dict[str, tuple[int, int]]:
+        files = {}
+        for dir, _, names in os.walk(self.root):
+            for x in names:
+                path = os.path.join(dir, x)
+                stat = os.stat(path)
+                rel = os.path.relpath(path, self.root).replace(os.sep, "/")
+                files[rel] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def refresh(self, num_workers: int = None) -> dict[str, list[str]]:
+        files = self.walk()
+        with self.connect() as con:
+            rows = con.execute("SELECT path, size, mtime FROM bundle WHERE root = ?", (self.root,))
+            known = {path: (size, mtime) for path, size, mtime in rows}
+
+        added = [k for k in files if k not in known]
+        modified = [k for k in files if k in known and known[k] != files[k]]
+        removed = [k for k in known if k not in files]
+
+        todo = added + modified
+        if todo != []:
+            print(f"[INFO] Scanning {len(todo)} bundles")
+            paths = [os.path.join(self.root, _) for _ in todo]
+            with ProcessPoolExecutor(num_workers) as executor:
+                records = list(executor.map(_scan, paths, chunksize=16))
+        else:
+            records = []
+
+        with self.connect() as con:
+            for x in removed + modified:
+                con.execute("DELETE FROM bundle WHERE root = ? AND path = ?", (self.root, x))
+                con.execute("DELETE FROM dep WHERE root = ? AND path = ?", (self.root, x))
+            for x, record in zip(todo, records):
+                size, mtime = files[x]
+                con.execute(
+                    "INSERT INTO bundle VALUES (?, ?, ?, ?, ?)",
+                    (self.root, x, size, mtime, json.dumps(record, ensure_ascii=False)),
+                )
+                con.executemany(
+                    "INSERT OR IGNORE INTO dep VALUES (?, ?, ?)",
+                    [(self.root, x, _) for _ in record.get("deps", [])],
+                )
+
+        return {"added": added, "modified": modified, "removed": removed}
+
+    def get(self, path: str) -> dict:
+        with self.connect() as con:
+            row = con.execute("SELECT record FROM bundle WHERE root = ? AND path = ?", (self.root, path)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def deps(self, path: str) -> list[str]:
+        with self.connect() as con:
+            rows = con.execute("SELECT dep FROM dep WHERE root = ? AND path = ?", (self.root, path))
+            return [_[0] for _ in rows]
+
+    def users(self, path: str) -> list[str]:
+        with self.connect() as con:
+            rows = con.execute("SELECT path FROM dep WHERE root = ? AND dep = ?", (self.root, path))
+            return sorted([_[0] for _ in rows])
+
+    def maps(self) -> dict[str, str]:
+        with self.connect() as con:
+            rows = con.execute("SELECT path, record FROM bundle WHERE root = ?", (self.root,))
+            records = {path: json.loads(record) for path, record in rows}
+        return {k: v["sprite"] for k, v in records.items() if v.get("sprite") is not None}
+
+    def missing(self) -> dict[str, list[str]]:
+        with self.connect() as con:
+            rows = con.execute(
+                "SELECT dep.path, dep.dep FROM dep LEFT JOIN bundle "
+                "ON dep.root = bundle.root AND dep.dep = bundle.path "
+                "WHERE dep.root = ? AND bundle.path IS NULL",
+                (self.root,),
+            )
+            res: dict[str, list[str]] = {}
+            for path, dep in rows:
+                res.setdefault(path, []).append(dep)
+        return res
+
+    def find(self, name: str) -> list[str]:
+        with self.connect() as con:
+            rows = con.execute("SELECT path, record FROM bundle WHERE root = ?", (self.root,))
+            records = {path: json.loads(record) for path, record in rows}
+        res = []
+        for k, v in records.items():
+            names = [_[0] for _ in v.get("textures", []) + v.get("sprites", [])]
+            if name in names:
+                res += [k]
+        return sorted(res)
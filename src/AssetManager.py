@@ -1,21 +1,41 @@
+import functools
 import os
 import re
 import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable
 
 import numpy as np
-import UnityPy
 from PIL import Image
-from UnityPy.classes import AssetBundle, GameObject, RectTransform, Texture2D
+from UnityPy.classes import AssetBundle, GameObject, RectTransform, Sprite, Texture2D
 from UnityPy.enums import ClassIDType
 
+from .EnvironmentPool import pool
 from .IconViewer import IconPreset
 from .Layer import Layer
-from .utility import filter_env, prod, read_img
+from .LazyMapping import LazyMapping
+from .MetaIndex import MetaIndex
+from .TextureCache import cache
+from .utility import filter_env, read_region
 from .Vector import Vector2
 
 
+def untrim(img: Image.Image, sprite: Sprite) -> Image.Image:
+    w, h = round(sprite.m_Rect.width), round(sprite.m_Rect.height)
+    rect, offset = sprite.m_RD.textureRect, sprite.m_RD.textureRectOffset
+    x, y, tw, th = round(rect.x), round(rect.y), round(rect.width), round(rect.height)
+    if (tw, th) == (w, h) or tw * th == 0:
+        return img
+    full = Image.new("RGBA", (w, h))
+    full.paste(img.crop((x, img.height - y - th, x + tw, img.height - y)), (round(offset.X), h - round(offset.Y) - th))
+    return full
+
+
 class AssetManager:
-    def __init__(self):
+    executor: Executor = None
+
+    def __init__(self, index: bool = True):
+        self.index = MetaIndex() if index else None
         self.init()
 
     def init(self):
@@ -25,100 +45,235 @@ class AssetManager:
         self.bias: Vector2 = None
         self.deps: dict[str, str] = {}
         self.maps: dict[str, str] = {}
-        self.layers: dict[str, Layer] = {}
-        self.faces: dict[str, Image.Image] = {}
-        self.icons: dict[str, Image.Image] = {}
+        self.geometry: dict[str, dict] = {}
+        self.faces: LazyMapping = LazyMapping()
+        self.face_textures: Callable[[], dict[str, Texture2D]] = None
+        self.icons: LazyMapping = LazyMapping()
         self.repls: dict[str, Image.Image] = {}
+        self.face_origin: tuple[int, int] = (0, 0)
+        self._layers: dict[str, Layer] = None
+
+    @property
+    def layers(self) -> dict[str, Layer]:
+        if self._layers is None:
+            self._load_painting()
+        return self._layers
 
     @property
     def face_layer(self):
         return self.layers["face"]
 
-    def analyze(self, file: str):
+    @property
+    def base(self) -> str:
+        return os.path.basename(self.meta).removesuffix("_n")
+
+    def analyze(self, file: str, prefetch: bool = False):
+        if self.meta != file:
+            self.release()
         self.init()
 
         self.meta = file
-        base = os.path.basename(file).removesuffix("_n")
+        record = None if self.index is None else self.index.get(file)
+        if record is None:
+            self._load_painting()
+
+            layers = list(self.layers.values())
+            x_min, y_min, x_max, y_max = layers[0].geometry.bounds(layers)
+            self.size = Vector2(x_max - x_min, y_max - y_min).round()
+            self.bias = Vector2(-x_min, -y_min)
+            self.geometry = {k: self._geometry(v) for k, v in self.layers.items()}
+
+            self._load_faces()
+            self._load_icons()
+        else:
+            self.name = record["name"]
+            self.size = Vector2(record["size"])
+            self.bias = Vector2(record["bias"])
+            self.deps = record["deps"]
+            self.maps = record["maps"]
+            self.geometry = record["geometry"]
+
+            self._load_faces(record["faces"])
+            self._load_icons(record["icons"])
+
+        if prefetch:
+            self.faces.prefetch(self.loader())
+            self.icons.prefetch(self.loader())
 
-        env = UnityPy.load(file)
+        print("[INFO] Dependencies:")
+        [print("      ", _) for _ in self.deps.keys()]
+
+        if record is None:
+            [print(_) for _ in self.layers.values()]
+            if self.index is not None:
+                self.index.put(file, self._record(), self._files())
+        else:
+            for v in self.geometry.values():
+                attrs = ["sizeDelta", "posMin", "posMax", "spriteSize"]
+                items = [f"{k[0].capitalize()}{k[1:]}: {tuple(v[k])}" for k in attrs if v[k] is not None]
+                print("\n       ".join([f"[INFO] Layer@{v['depth']} {v['name']} (indexed)"] + items))
+
+    def _load_painting(self):
+        env = pool.get(self.meta)
         abs: list[AssetBundle] = filter_env(env, AssetBundle)
         for dep in abs[0].m_Dependencies:
-            path = os.path.join(os.path.dirname(file) + "/", dep)
+            path = os.path.join(os.path.dirname(self.meta) + "/", dep)
             assert os.path.exists(path), f"Dependency not found: {dep}"
             self.deps[dep] = path
-            env.load_file(path)
+            pool.attach(self.meta, path)
 
             if not dep.startswith("paintingface"):
                 for x in env.files[path].container.values():
                     if x.type == ClassIDType.Sprite:
                         self.maps[dep] = x.read().name
 
-        face = os.path.join("paintingface/", base)
-        path = os.path.join(os.path.dirname(file) + "/", face)
+        base_go: GameObject = list(env.container.values())[0].read()
+        base_rt: RectTransform = base_go.m_Transform.read()
+        base_layer = Layer(base_rt)
+
+        self.name = base_layer.name
+
+        self._layers = base_layer.flatten()
+        if "face" not in [x.name for x in self._layers.values()]:
+            self._layers["face"] = base_layer.get_child("face")
+
+    def _load_faces(self, names: list[str] = None):
+        face = os.path.join("paintingface/", self.base)
+        path = os.path.join(os.path.dirname(self.meta) + "/", face)
         if os.path.exists(path):
             self.deps[face] = path
-            env.load_file(path)
-            self.faces |= {
-                _.name: _.image
-                for _ in filter_env(env, Texture2D)
-                if re.match(r"^0|([1-9][0-9]*)$", _.name)
-            }
+
+            def match(name: str) -> bool:
+                return re.match(r"^0|([1-9][0-9]*)$", name) is not None
+
+            def load(name: str) -> Image.Image:
+                img = cache.get(textures()[name])
+                sprite = textures(Sprite).get(name)
+                return img if sprite is None else untrim(img, sprite)
+
+            textures = self._objects(path, match)
+            self.face_textures = textures
+            if names is None:
+                names = list(textures())
+            self.faces = LazyMapping({x: functools.partial(load, x) for x in names})
         else:
             self.deps[face] = None
 
+    def _load_icons(self, kinds: list[str] = None):
+        def match(name: str) -> bool:
+            return name.lower() == self.base.lower()
+
+        def load(textures: Callable[[], dict[str, Texture2D]]) -> Image.Image:
+            return cache.get(list(textures().values())[-1])
+
+        loaders = {}
         for kind in ["shipyardicon", "squareicon", "herohrzicon"]:
-            icon = os.path.join(kind + "/", base)
-            path = os.path.join(os.path.dirname(file) + "/", icon)
+            icon = os.path.join(kind + "/", self.base)
+            path = os.path.join(os.path.dirname(self.meta) + "/", icon)
             if os.path.exists(path):
-                env.load_file(path)
-                self.icons |= {
-                    kind: _.image
-                    for _ in filter_env(env, Texture2D)
-                    if re.match(f"^(?i){base}$", _.name)
-                }
+                textures = self._objects(path, match)
+                if kinds is None and list(textures()) == []:
+                    continue
+                if kinds is None or kind in kinds:
+                    loaders[kind] = functools.partial(load, textures)
+        self.icons = LazyMapping(loaders)
 
-        print("[INFO] Dependencies:")
-        [print("      ", _) for _ in self.deps.keys()]
+    def face_size(self, name: str) -> tuple[int, int]:
+        sprite = self.face_textures(Sprite).get(name)
+        if sprite is not None:
+            return round(sprite.m_Rect.width), round(sprite.m_Rect.height)
+        tex2d = self.face_textures()[name]
+        return tex2d.m_Width, tex2d.m_Height
 
-        base_go: GameObject = list(env.container.values())[0].read()
-        base_rt: RectTransform = base_go.m_Transform.read()
-        base_layer = Layer(base_rt)
+    def _objects(self, path: str, match: Callable[[str], bool]) -> Callable[[type], dict]:
+        lock = threading.Lock()
 
-        self.name = base_layer.name
+        @functools.cache
+        def load(type: type) -> dict:
+            env = pool.get(path)
+            return {_.name: _ for _ in filter_env(env, type) if match(_.name)}
 
-        self.layers: dict[str, Layer] = base_layer.flatten()
-        if "face" not in [x.name for x in self.layers.values()]:
-            self.layers["face"] = base_layer.get_child("face")
-        [print(_) for _ in self.layers.values()]
+        def locked(type: type = Texture2D) -> dict:
+            with lock:
+                return load(type)
 
-        x_min = min([_.posMin.X for _ in self.layers.values()])
-        x_max = max([_.posMax.X for _ in self.layers.values()])
-        y_min = min([_.posMin.Y for _ in self.layers.values()])
-        y_max = max([_.posMax.Y for _ in self.layers.values()])
-        self.size = Vector2(x_max - x_min, y_max - y_min).round()
-        self.bias = Vector2(-x_min, -y_min)
+        return locked
+
+    def _files(self) -> list[str]:
+        files = [_ for _ in self.deps.values() if _ is not None]
+        files += [os.path.join(os.path.dirname(self.meta), "paintingface", self.base)]
+        for kind in ["shipyardicon", "squareicon", "herohrzicon"]:
+            files += [os.path.join(os.path.dirname(self.meta), kind, self.base)]
+        return files
+
+    def release(self):
+        if self.meta is not None:
+            [pool.release(_) for _ in [self.meta] + self._files()]
+
+    def _geometry(self, layer: Layer) -> dict:
+        def tuple_or_none(x: Vector2):
+            return None if x is None else x.tuple()
+
+        return {
+            "name": layer.name,
+            "depth": layer.depth,
+            "pathId": layer.pathId,
+            "sizeDelta": layer.sizeDelta.tuple(),
+            "pivot": layer.pivot.tuple(),
+            "posMin": layer.posMin.tuple(),
+            "posMax": layer.posMax.tuple(),
+            "spriteSize": tuple_or_none(layer.spriteSize),
+            "canvasSize": layer.canvasSize.tuple(),
+        }
+
+    def _record(self) -> dict:
+        return {
+            "name": self.name,
+            "size": self.size.tuple(),
+            "bias": self.bias.tuple(),
+            "deps": self.deps,
+            "maps": self.maps,
+            "faces": list(self.faces),
+            "icons": list(self.icons),
+            "geometry": self.geometry,
+        }
+
+    @classmethod
+    def loader(cls) -> Executor:
+        if cls.executor is None:
+            cls.executor = ThreadPoolExecutor(os.cpu_count(), thread_name_prefix="load")
+        return cls.executor
+
+    def _run(self, func: Callable, workload: dict):
+        [_.result() for _ in [self.loader().submit(func, k, v) for k, v in workload.items()]]
 
     def load_paintings(self, workload: dict[str, str]):
         def load(name: str, path: str):
             print("      ", path)
-            layer = self.layers[name]
-            x, y = layer.posMin + self.bias
-            w, h = layer.canvasSize
-            sub = read_img(path).crop((x, y, x + w, y + h))
-            self.repls[name] = sub.resize(layer.spriteSize.round().tuple())
+            x, y = self._geo(name, "posMin") + self.bias
+            w, h = self._geo(name, "canvasSize")
+            sub = read_region(path, (x, y, x + w, y + h))
+            self.repls[name] = sub.resize(self._geo(name, "spriteSize").round().tuple())
+
+        self._run(load, workload)
 
-        tasks = [threading.Thread(target=load, args=(k, v)) for k, v in workload.items()]
-        [_.start() for _ in tasks]
-        [_.join() for _ in tasks]
+    def face_box(self) -> tuple[int, int, int, int]:
+        prefered = self.prefered()
+        x, y = self._geo("face", "posMin") + self.bias
+        w, h = self._geo("face", "sizeDelta")
+        px, py = self._geo(prefered, "posMin") + self.bias
+        pw, ph = self._geo(prefered, "canvasSize")
+        boxes = [[round(_) for _ in box] for box in [(x, y, x + w + 1, y + h + 1), (px, py, px + pw, py + ph)]]
+        return *np.min(boxes, axis=0)[:2].tolist(), *np.max(boxes, axis=0)[2:].tolist()
 
     def load_faces(self, workload: dict[int, str]):
         def load(name: str, path: str):
             print("      ", path)
-            self.repls[name] = read_img(path)
+            self.repls[name] = read_region(path, box)
 
-        tasks = [threading.Thread(target=load, args=(k, v)) for k, v in workload.items()]
-        [_.start() for _ in tasks]
-        [_.join() for _ in tasks]
+        box = self.face_box()
+        self.face_origin = box[0], box[1]
+        self._run(load, workload)
 
     def clip_icons(self, workload: str, presets: dict[str, IconPreset]):
         def clip(kind: str, preset: IconPreset):
@@ -142,20 +297,26 @@ class AssetManager:
         full, center = self.prepare_icon(workload)
         output = []
 
-        tasks = [threading.Thread(target=clip, args=(k, v)) for k, v in presets.items()]
-        [_.start() for _ in tasks]
-        [_.join() for _ in tasks]
-
+        self._run(clip, presets)
         return output
 
-    def prefered(self, layer: Layer) -> Layer:
-        expands = [x for x in self.layers.values() if x.name != "face" and x.contain(*layer.box)]
-        return sorted(expands, key=lambda v: prod(v.canvasSize))[0]
+    def _geo(self, key: str, attr: str) -> Vector2:
+        return Vector2(self.geometry[key][attr])
+
+    def prefered(self, key: str = "face") -> str:
+        keys = [k for k, v in self.geometry.items() if v["name"] != "face"]
+        pos_min = np.array([self.geometry[k]["posMin"] for k in keys], dtype=np.float64)
+        pos_max = np.array([self.geometry[k]["posMax"] for k in keys], dtype=np.float64)
+        l, b, r, t = *self.geometry[key]["posMin"], *self.geometry[key]["posMax"]
+        contain = (l >= pos_min[:, 0]) & (b >= pos_min[:, 1]) & (r <= pos_max[:, 0]) & (t <= pos_max[:, 1])
+        expands = np.flatnonzero(contain)
+        area = np.prod([self.geometry[keys[i]]["canvasSize"] for i in expands], axis=1)
+        return keys[expands[np.argmin(area)]]
 
     def prepare_icon(self, file: str) -> tuple[Image.Image, Vector2]:
-        prefered = self.prefered(self.face_layer)
-        x, y = prefered.posMin + self.bias
-        w, h = prefered.canvasSize
-        full = read_img(file).crop((x, y, x + w, y + h)).resize(prefered.spriteSize)
-        center = self.face_layer.posMin - prefered.posMin + self.face_layer.sizeDelta / 2
+        prefered = self.prefered()
+        x, y = self._geo(prefered, "posMin") + self.bias
+        w, h = self._geo(prefered, "canvasSize")
+        full = read_region(file, (x, y, x + w, y + h)).resize(self._geo(prefered, "spriteSize").round().tuple())
+        center = self._geo("face", "posMin") - self._geo(prefered, "posMin") + self._geo("face", "sizeDelta") / 2
         return full, center
@@ -1,57 +1,207 @@
 import os
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
 from math import ceil, floor
+from typing import Callable, Iterator, Optional
 
 import numpy as np
 from PIL import Image
-from pytoshop.enums import ColorMode
-from pytoshop.user import nested_layers
+from UnityPy.classes import Sprite, Texture2D
 from tqdm import tqdm
 
+from .LayerWriter import LayerWriter
+from .NpyWriter import NpyWriter
+from .OraWriter import OraWriter
+from .PngWriter import PngWriter
+from .PsdWriter import PsdWriter
+from .TextureCache import TextureCache, cache, layer_cache
 from .TextureHelper import TextureHelper
+from .TiffWriter import TiffWriter
+from .utility import write_img
+
+
+def decode_face(img: Image.Image, x: float, y: float) -> Image.Image:
+    return img.transform(img.size, Image.AFFINE, (1, 0, floor(x) - x, 0, 1, y - ceil(y)), Image.Resampling.BICUBIC)
+
+
+def warp(
+    tex: Image.Image,
+    boxes: np.ndarray,
+    quads: np.ndarray,
+    sprite_size: tuple[int, int],
+    canvas_size: tuple[int, int],
+    dx: float = 0,
+    dy: float = 0,
+) -> Image.Image:
+    sw, sh = sprite_size
+    cw, ch = canvas_size
+    sx, sy = cw / sw, ch / sh
+
+    x0, y0, x1, y1 = boxes.T.astype(np.float64)
+    valid = (x1 > x0) & (y1 > y0)
+    x0, y0, x1, y1, quads = x0[valid], y0[valid], x1[valid], y1[valid], quads[valid]
+
+    l = np.round(x0 * sx - dx)
+    r = np.round(x1 * sx - dx)
+    t = np.round((sh - y1) * sy - dy)
+    b = np.round((sh - y0) * sy - dy)
+    valid = (r > l) & (b > t)
+    x0, y0, x1, y1, quads = x0[valid], y0[valid], x1[valid], y1[valid], quads[valid]
+    l, r, t, b = l[valid], r[valid], t[valid], b[valid]
+
+    nw, sw_, se, ne = [quads[:, i : i + 2].astype(np.float64) for i in range(0, 8, 2)]
+
+    def source(px: np.ndarray, py: np.ndarray) -> np.ndarray:
+        u = ((px + dx) / sx - x0) / (x1 - x0)
+        v = ((sh - (py + dy) / sy) - y0) / (y1 - y0)
+        u, v = u[:, None], v[:, None]
+        pos = nw * (1 - u) * (1 - v) + sw_ * (1 - u) * v + se * u * v + ne * u * (1 - v)
+        return pos * (1, -1) + (0, tex.height)
+
+    corners = [source(l, t), source(l, b), source(r, b), source(r, t)]
+    boxes = np.stack([l, t, r, b], axis=1).astype(np.int64).tolist()
+    quads = np.concatenate(corners, axis=1).tolist()
+    return tex.transform(canvas_size, Image.MESH, list(zip(boxes, quads)), Image.Resampling.BICUBIC)
+
+
+def decode_layer(
+    tex: Image.Image,
+    boxes: np.ndarray,
+    quads: np.ndarray,
+    sprite_size: tuple[int, int],
+    canvas_size: tuple[int, int],
+    x: float,
+    y: float,
+    plain: bool = False,
+    dump: str = None,
+) -> Image.Image:
+    if dump is not None:
+        write_img(warp(tex, boxes, quads, sprite_size, sprite_size), dump)
+
+    dx, dy = floor(x) - x, y - ceil(y)
+    if plain and sprite_size == canvas_size and dx == 0 and dy == 0:
+        if tex.size == canvas_size:
+            return tex
+        sub = Image.new(tex.mode, canvas_size)
+        sub.paste(tex, (0, canvas_size[1] - tex.height))
+        return sub
+
+    return warp(tex, boxes, quads, sprite_size, canvas_size, dx, dy)
 
 
 class DecodeHelper(TextureHelper):
-    def exec(self, dir: str, dump: bool) -> str:
-        print("[INFO] Decoding paintingface")
-        face = []
-        for k, v in tqdm(sorted(self.faces.items(), key=lambda x: int(x[0]))):
-            x, y = self.face_layer.posMin + self.bias
-            sub = v.transform(v.size, Image.AFFINE, (1, 0, floor(x) - x, 0, 1, y - ceil(y)), Image.Resampling.BICUBIC)
-            face += [self.ps_layer(sub, str(k), floor(x), ceil(y), False)]
-
-        print("[INFO] Decoding painting")
-        painting = []
-        for k, v in tqdm(self.layers.items()):
-            if k == "face":
-                painting += [nested_layers.Group(name="paintingface", layers=face, closed=False)]
-            else:
-                sub = v.tex.transform(v.spriteSize.round().tuple(), Image.MESH, v.mesh, Image.Resampling.BICUBIC)
-                sub = sub.transpose(Image.FLIP_TOP_BOTTOM)
-                if dump:
-                    sub.save(f"{os.path.join(dir, k)}.png")
-                sub = sub.resize(v.canvasSize.round().tuple(), Image.Resampling.BICUBIC)
-                x, y = v.posMin + self.bias
-                sub = sub.transform(sub.size, Image.AFFINE, (1, 0, floor(x) - x, 0, 1, y - ceil(y)))
-                painting += [self.ps_layer(sub, k, floor(x), ceil(y), True)]
-
-        psd = nested_layers.nested_layers_to_psd(painting[::-1], color_mode=ColorMode.rgb)
-        path = os.path.join(dir, self.name + ".psd")
-        with open(path, "wb") as f:
-            psd.write(f)
+    VERSION = 1
+    writers: dict[str, type[LayerWriter]] = {
+        "psd": PsdWriter,
+        "ora": OraWriter,
+        "tiff": TiffWriter,
+        "png": PngWriter,
+        "npy": NpyWriter,
+    }
+
+    def exec(
+        self,
+        dir: str,
+        dump: bool,
+        num_workers: int = None,
+        process: bool = False,
+        compression: str = "rle",
+        format: str = "psd",
+        incremental: bool = False,
+    ) -> str:
+        Writer = self.writers[format]
+        path = os.path.join(dir, self.name + Writer.ext)
+        options = {"compression": compression} if Writer is PsdWriter else {}
+        window = 2 * (num_workers or os.cpu_count())
+
+        executor: Executor
+        with (ProcessPoolExecutor if process else ThreadPoolExecutor)(num_workers) as executor:
+
+            def submit(
+                func: Callable, fetch: Callable[[], Image.Image], tex2d: Optional[Texture2D], *args, salt: tuple = ()
+            ) -> Future:
+                key = None
+                if incremental and not dump:
+                    key = layer_cache.digest(self.VERSION, func.__name__, TextureCache.key(tex2d), *args, *salt)
+                    img = layer_cache.load(key)
+                    if img is not None:
+                        sub = Future()
+                        sub.set_result(img)
+                        return sub
+
+                if process:
+                    sub = executor.submit(func, fetch(), *args)
+                else:
+                    sub = executor.submit(lambda: func(fetch(), *args))
+                if key is not None:
+
+                    def store(sub: Future):
+                        if sub.exception() is None:
+                            layer_cache.store(key, sub.result())
+
+                    sub.add_done_callback(store)
+                return sub
+
+            def steps() -> Iterator[tuple]:
+                for k, v in self.layers.items():
+                    x, y = v.posMin + self.bias
+                    if k == "face":
+                        yield ("begin", "paintingface")
+                        for f in sorted(self.faces, key=lambda x: int(x), reverse=True):
+                            tex2d, rect = None, ()
+                            if incremental:
+                                tex2d = self.asset_manager.face_textures()[f]
+                                rect = self.sprite_rect(self.asset_manager.face_textures(Sprite).get(f))
+                            sub = submit(decode_face, lambda f=f: self.faces[f], tex2d, x, y, salt=rect)
+                            yield ("layer", f, sub, x, y, False)
+                        yield ("end",)
+                    else:
+                        sub = submit(
+                            decode_layer,
+                            lambda v=v: cache.get(v.texture2D),
+                            v.texture2D,
+                            *v.meshArrays,
+                            v.spriteSize.round().tuple(),
+                            v.canvasSize.round().tuple(),
+                            x,
+                            y,
+                            v.rawMesh is None,
+                            f"{os.path.join(dir, k)}{'.npy' if format == 'npy' else '.png'}" if dump else None,
+                        )
+                        yield ("layer", k, sub, x, y, True)
+
+            print("[INFO] Decoding painting")
+            total = len(self.layers) + len(self.faces) - 1
+            with Writer(path, num_workers, **options) as writer, tqdm(total=total) as progress:
+                pending: deque[tuple] = deque()
+                for step in steps():
+                    pending.append(step)
+                    while len(pending) > window:
+                        self.write(writer, pending.popleft(), progress)
+                while len(pending) > 0:
+                    self.write(writer, pending.popleft(), progress)
+                writer.close()
 
         return path
 
-    def ps_layer(self, img: Image.Image, name: str, x: int, y: int, visible: bool) -> nested_layers.Layer:
-        w, h = img.size
-        r, g, b, a = img.split()
-        channels = {i - 1: np.array(x) for i, x in enumerate([a, r, g, b])}
-        layer = nested_layers.Image(
-            name=name,
-            visible=visible,
-            top=self.size[1] - y - h,
-            left=x,
-            bottom=self.size[1] - y,
-            right=x + w,
-            channels=channels,
+    @staticmethod
+    def sprite_rect(sprite: Optional[Sprite]) -> tuple:
+        if sprite is None:
+            return ()
+        rect, offset = sprite.m_RD.textureRect, sprite.m_RD.textureRectOffset
+        return (
+            (sprite.m_Rect.width, sprite.m_Rect.height),
+            (rect.x, rect.y, rect.width, rect.height),
+            (offset.X, offset.Y),
         )
-        return layer
+
+    def write(self, writer: LayerWriter, step: tuple, progress: tqdm):
+        if step[0] == "begin":
+            writer.begin_group(step[1])
+        elif step[0] == "end":
+            writer.end_group()
+        else:
+            _, name, sub, x, y, visible = step
+            img: Image.Image = sub.result()
+            writer.add_layer(img, name, self.size[1] - ceil(y) - img.height, floor(x), visible)
+            progress.update()
@@ -0,0 +1,101 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+from .TextureEncoder import TextureEncoder
+from .utility import cache_path
+
+
+class EncodeCache:
+    VERSION = 1
+
+    def __init__(self, path: str = None, capacity: int = 4 << 30):
+        self.path = cache_path("encode") if path is None else path
+        self.capacity = capacity
+        self.usage: int = None
+        self.hashes: dict[str, str] = {}
+
+    def hash_file(self, path: str) -> str:
+        if path not in self.hashes:
+            sha1 = hashlib.sha1()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    sha1.update(chunk)
+            self.hashes[path] = sha1.hexdigest()
+        return self.hashes[path]
+
+    def key(self, func: str, path: str, args: tuple, textures: dict[str, tuple]) -> str:
+        sha1 = hashlib.sha1(repr((self.VERSION, func, self.hash_file(path))).encode())
+
+        def update(x):
+            if isinstance(x, Image.Image):
+                sha1.update(repr((x.mode, x.size)).encode() + np.asarray(x).tobytes())
+            elif isinstance(x, TextureEncoder):
+                sha1.update(repr((x.format, x.quality)).encode())
+            else:
+                sha1.update(repr(x).encode())
+
+        [update(x) for x in args]
+        for k in sorted(textures):
+            update(k)
+            [update(x) for x in textures[k]]
+        return sha1.hexdigest()
+
+    def file(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key)
+
+    def get(self, key: str, output: str) -> bool:
+        file = self.file(key)
+        if not os.path.exists(file):
+            return False
+        shutil.copyfile(file, output)
+        os.utime(file)
+        return True
+
+    def put(self, key: str, output: str):
+        file = self.file(key)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(".tmp", dir=os.path.dirname(file))
+        os.close(fd)
+        try:
+            shutil.copyfile(output, tmp)
+            os.replace(tmp, file)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        if self.usage is None:
+            self.usage = sum([os.path.getsize(x) for x, _ in self.walk()])
+        else:
+            self.usage += os.path.getsize(file)
+        if self.usage > self.capacity:
+            self.evict()
+
+    def walk(self) -> list[tuple[str, float]]:
+        files = []
+        for root, _, names in os.walk(self.path):
+            for x in names:
+                if not x.endswith(".tmp"):
+                    path = os.path.join(root, x)
+                    try:
+                        files += [(path, os.path.getmtime(path))]
+                    except OSError:
+                        pass
+        return files
+
+    def evict(self):
+        files = sorted(self.walk(), key=lambda x: x[1])
+        self.usage = sum([os.path.getsize(x) for x, _ in files])
+        for x, _ in files:
+            if self.usage <= self.capacity * 3 // 4:
+                break
+            try:
+                size = os.path.getsize(x)
+                os.remove(x)
+                self.usage -= size
+            except OSError:
+                pass
@@ -1,16 +1,22 @@
+import json
 import os
-import re
 import struct
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from math import ceil, sqrt
+from typing import Callable, Optional
 
-import UnityPy
+import numpy as np
 from PIL import Image
 from tqdm import tqdm
 from UnityPy.classes import Mesh, Sprite, Texture2D
-from UnityPy.enums import TextureFormat
 
+from .EncodeCache import EncodeCache
+from .EnvironmentPool import pool
 from .IconViewer import IconPreset
+from .TextureCache import cache
+from .TextureEncoder import Encoded, TextureEncoder
 from .TextureHelper import TextureHelper
-from .utility import check_dir, filter_env
+from .utility import check_dir, filter_env, find_env
 
 
 def aspect_ratio(preset: IconPreset, w: int, h: int, clip: bool):
@@ -20,164 +26,335 @@ def aspect_ratio(preset: IconPreset, w: int, h: int, clip: bool):
     return w, h
 
 
-class EncodeHelper(TextureHelper):
-    def exec(
-        self, dir: str, replace_icon: bool, adv_mode: bool, is_clip: dict[str, bool]
-    ) -> list[str]:
-        painting = []
-        valid = [os.path.basename(k) for k, v in self.maps.items() if v in self.repls]
-        if valid != []:
-            print("[INFO] Encoding painting")
-            painting += [self._replace_painting(dir, x) for x in tqdm(valid)]
+def paste(out: np.ndarray, img: Image.Image, box: tuple, origin: tuple[int, int], channels: slice = slice(None)):
+    x0, y0 = max(box[0], origin[0], 0), max(box[1], origin[1], 0)
+    x1, y1 = min(box[2], origin[0] + out.shape[1], img.width), min(box[3], origin[1] + out.shape[0], img.height)
+    if x0 < x1 and y0 < y1:
+        data = np.asarray(img.crop((x0, y0, x1, y1)).convert("RGBA"))
+        out[y0 - origin[1] : y1 - origin[1], x0 - origin[0] : x1 - origin[0], channels] = data[..., channels]
+
+
+def pack_tiles(
+    img: Image.Image, block: tuple[int, int], size: int = 64, gutter: int = 2
+) -> Optional[tuple[Image.Image, list[tuple]]]:
+    data = np.asarray(img.convert("RGBA"))
+    h, w = data.shape[:2]
+    cw, ch = [ceil(size / x) * x for x in block]
+    tw, th = cw - 2 * gutter, ch - 2 * gutter
+    nx, ny = ceil(w / tw), ceil(h / th)
+    alpha = np.pad(data[..., 3], ((0, ny * th - h), (0, nx * tw - w)))
+    tiles = np.argwhere(alpha.reshape(ny, th, nx, tw).any(axis=(1, 3))).tolist()
+    if tiles == []:
+        return None
+    cols = ceil(sqrt(len(tiles)))
+    rows = ceil(len(tiles) / cols)
+    if cols * cw * rows * ch >= w * h:
+        return None
+
+    padded = np.pad(data, ((gutter, gutter + ny * th - h), (gutter, gutter + nx * tw - w), (0, 0)))
+    atlas = np.zeros((rows * ch, cols * cw, 4), np.uint8)
+    quads = []
+    for i, (ty, tx) in enumerate(tiles):
+        x, y = tx * tw, ty * th
+        ax, ay = i % cols * cw, i // cols * ch
+        atlas[ay : ay + ch, ax : ax + cw] = padded[y : y + ch, x : x + cw]
+        x1, y1 = min(x + tw, w), min(y + th, h)
+        ax, ay = ax + gutter, ay + gutter
+        quads += [((x, y, x1, y1), (ax, ay, ax + x1 - x, ay + y1 - y))]
+    quads += [((w, h, w, h), (0, 0, 0, 0))]
+    return Image.fromarray(atlas), quads
+
+
+def mesh_buffers(quads: list[tuple], w: int, h: int) -> tuple[list[float], list[int]]:
+    buf, idx = [], []
+    for i, ((x0, y0, x1, y1), (u0, v0, u1, v1)) in enumerate(quads):
+        u0, v0, u1, v1 = u0 / w, v0 / h, u1 / w, v1 / h
+        buf += [x0, y0, 0, u0, v0, x0, y1, 0, u0, v1, x1, y1, 0, u1, v1, x1, y0, 0, u1, v0]
+        idx += [4 * i, 4 * i + 1, 4 * i + 2, 4 * i + 2, 4 * i + 3, 4 * i]
+    return buf, idx
+
+
+def unchanged(img: Image.Image, size: tuple[int, int], origin: Callable[[], Image.Image]) -> bool:
+    if img.size != tuple(size):
+        return False
+    return np.array_equal(np.asarray(origin().convert("RGBA"))[::-1], np.asarray(img.convert("RGBA")))
+
+
+def trim_face(img: Image.Image) -> tuple[Image.Image, tuple[int, int, int, int]]:
+    alpha = np.asarray(img.convert("RGBA"))[..., 3]
+    rows, cols = np.flatnonzero(alpha.any(axis=1)), np.flatnonzero(alpha.any(axis=0))
+    if len(rows) == 0:
+        return img, (*img.size, 0, 0)
+    x0, y0, x1, y1 = cols[0], rows[0], cols[-1] + 1, rows[-1] + 1
+    return img.crop((x0, y0, x1, y1)), (*img.size, int(x0), int(y0))
+
+
+def encode_painting(path: str, output: str, quads: Optional[list[tuple]], textures: dict[str, Encoded]) -> str:
+    with pool.borrow(path) as env:
+        file = pool.name(env, path)
+        tex2d: Texture2D
+        for tex2d in filter_env(env, Texture2D, file=file):
+            TextureEncoder.apply(tex2d, textures[tex2d.name])
+
+        meshes = filter_env(env, Mesh, False, file)
+        if quads is not None and meshes == []:
+            raise RuntimeError("No mesh to map the trimmed texture")
+        for _ in meshes:
+            mesh = _.read_typetree()
 
-        face = []
-        if "1" in self.repls:
-            print("[INFO] Encoding paintingface")
-            face += self._replace_face(dir, adv_mode, is_clip)
+            w, h = textures[mesh["m_Name"].removesuffix("-mesh")][2]
+            if quads is None:
+                quads = [((0, 0, w, h), (0, 0, w, h))]
+            assert len(quads) * 4 <= 0xFFFF, f"Too many tiles: {len(quads)}"
+            buf, idx = mesh_buffers(quads, w, h)
+
+            mesh["m_SubMeshes"][0]["indexCount"] = len(idx)
+            mesh["m_SubMeshes"][0]["vertexCount"] = len(quads) * 4
+            mesh["m_IndexBuffer"] = list(struct.pack(_.reader.endian + "H" * len(idx), *idx))
+            mesh["m_VertexData"]["m_VertexCount"] = len(quads) * 4
+            data_size = struct.pack(_.reader.endian + "f" * len(buf), *buf)
+            mesh["m_VertexData"]["m_DataSize"] = memoryview(data_size)
 
-        icon = []
-        valid = [k for k in self.icons.keys() if k in self.repls]
-        if replace_icon and valid != []:
-            print("[INFO] Encoding icons")
-            icon += [self._replace_icon(dir, x) for x in tqdm(valid)]
+            _.save_typetree(mesh)
 
-        return painting + face + icon
+        with open(output, "wb") as f:
+            f.write(env.files[file].save("original"))
+        return output
 
-    def _replace_painting(self, dir: str, asset: str) -> str:
-        path = os.path.join(os.path.dirname(self.meta), "painting", asset)
-        env = UnityPy.load(path)
 
-        for _ in filter_env(env, Texture2D):
-            tex2d: Texture2D = _.read()
-            img = self.repls[tex2d.name]
-            tex2d.m_Width, tex2d.m_Height = img.size
-            tex2d.set_image(img.transpose(Image.FLIP_TOP_BOTTOM), TextureFormat.RGBA32)
-            tex2d.save()
+def encode_face(path: str, output: str, rects: dict[str, tuple], textures: dict[str, Encoded]) -> str:
+    with pool.borrow(path) as env:
+        for k, v in textures.items():
+            tex2d: Texture2D
+            for tex2d in find_env(env, Texture2D, k):
+                TextureEncoder.apply(tex2d, v)
+
+            sprite: Sprite
+            for sprite in find_env(env, Sprite, k):
+                w, h, x, y = rects[k]
+                sprite.m_Rect.width, sprite.m_Rect.height = w, h
+                sprite.m_RD.textureRect.x, sprite.m_RD.textureRect.y = 0, 0
+                sprite.m_RD.textureRect.width, sprite.m_RD.textureRect.height = v[2]
+                sprite.m_RD.textureRectOffset.X, sprite.m_RD.textureRectOffset.Y = x, y
+                sprite.save()
 
-        for _ in filter_env(env, Mesh, False):
-            mesh = _.read_typetree()
+        with open(output, "wb") as f:
+            f.write(env.file.save("original"))
+        return output
 
-            mesh["m_SubMeshes"][0]["indexCount"] = 6
-            mesh["m_SubMeshes"][0]["vertexCount"] = 4
-            mesh["m_IndexBuffer"] = [0, 0, 1, 0, 2, 0, 2, 0, 3, 0, 0, 0]
-            mesh["m_VertexData"]["m_VertexCount"] = 4
-            w, h = self.repls[mesh["m_Name"].removesuffix("-mesh")].size
-            buf = [0, 0, 0, 0, 0, 0, h, 0, 0, 1, w, h, 0, 1, 1, w, 0, 0, 1, 0]
-            data_size = struct.pack(_.reader.endian + "f" * 20, *buf)
-            mesh["m_VertexData"]["m_DataSize"] = memoryview(data_size)
 
-            _.save_typetree(mesh)
+def encode_face_rt(path: str, output: str, path_id: int, rt: dict, textures: dict[str, Encoded]) -> str:
+    with pool.borrow(path) as env:
+        cab = list(env.cabs.values())[0]
+        face_rt = cab.objects[path_id]
+        face_rt.save_typetree(face_rt.read_typetree() | rt)
 
-        check_dir(dir, "output", "painting")
-        output = os.path.join(dir, "output", "painting", asset)
         with open(output, "wb") as f:
             f.write(env.file.save("original"))
-
         return output
 
-    def _replace_face(self, dir: str, adv_mode: bool, is_clip: dict[str, bool]) -> list[str]:
+
+def encode_icon(
+    path: str, output: str, kind: str, img: Image.Image, encoder: TextureEncoder, textures: dict[str, Encoded]
+) -> Optional[str]:
+    with pool.borrow(path) as env:
+        preset = IconPreset.default()[kind]
+        for v in env.container.values():
+            tex2d_size = aspect_ratio(preset, *img.size, False)
+            sprite_size = aspect_ratio(preset, *img.size, True)
+            sub = Image.new("RGBA", tex2d_size)
+            sub.paste(img.crop((0, 0, *sprite_size)))
+
+            sprite: Sprite = v.read()
+            tex2d: Texture2D = sprite.m_RD.texture.read()
+            sub = sub.resize((tex2d.m_Width, tex2d.m_Height)).transpose(Image.FLIP_TOP_BOTTOM)
+            if unchanged(sub, (tex2d.m_Width, tex2d.m_Height), lambda: cache.get(tex2d)):
+                return None
+            TextureEncoder.apply(tex2d, encoder.encode(sub, tex2d.m_TextureFormat))
+
+            with open(output, "wb") as f:
+                f.write(env.file.save("original"))
+            return output
+
+
+class EncodeHelper(TextureHelper):
+    def exec(
+        self,
+        dir: str,
+        replace_icon: bool,
+        adv_mode: bool,
+        is_clip: dict[str, bool],
+        num_workers: int = None,
+        formats: dict[str, str] = None,
+        quality: str = "normal",
+        reuse: bool = True,
+        trim: bool = False,
+        trim_faces: bool = False,
+    ) -> list[str]:
+        formats = {} if formats is None else formats
+        self.trim = trim
+        self.trim_faces = trim_faces
+        self.encoders = {k: TextureEncoder(formats.get(k, "RGBA32"), quality) for k in ["painting", "face", "icon"]}
+
+        tasks: list[tuple[str, Callable, tuple, dict]] = []
+        for k, v in self.maps.items():
+            if v in self.repls:
+                tasks += [self._replace_painting(dir, os.path.basename(k), v)]
+
+        if "1" in self.repls:
+            print("[INFO] Preparing paintingface")
+            tasks += self._replace_face(dir, adv_mode, is_clip, num_workers)
+
+        if replace_icon:
+            tasks += [self._replace_icon(dir, k) for k in self.icons.keys() if k in self.repls]
+        tasks = [x for x in tasks if x is not None]
+
+        store = EncodeCache() if reuse else None
+        keys = [None if store is None else store.key(x[1].__name__, x[2][0], x[2][2:], x[3]) for x in tasks]
+        reused = [store is not None and store.get(k, x[2][1]) for k, x in zip(keys, tasks)]
+
+        print(f"[INFO] Encoding bundles ({sum(reused)} reused)")
+        outputs, errors, manifest = [], [], {}
+        with ProcessPoolExecutor(num_workers) as executor:
+            jobs = [
+                {} if r else {k: v[0].submit(*v[1:], executor) for k, v in x[3].items()} for x, r in zip(tasks, reused)
+            ]
+            futures: list[Future] = []
+            for (_, func, args, _), job, r in zip(tasks, jobs, reused):
+                futures += [Future()]
+                try:
+                    if r:
+                        futures[-1].set_result(args[1])
+                    else:
+                        textures = {k: TextureEncoder.join(v) for k, v in job.items()}
+                        futures[-1] = executor.submit(func, *args, textures)
+                except Exception as e:
+                    futures[-1].set_exception(e)
+
+            for (name, _, _, _), key, r, future in zip(tasks, keys, reused, tqdm(futures)):
+                try:
+                    res = future.result()
+                    if res is not None:
+                        outputs += [res]
+                        if store is not None and not r:
+                            store.put(key, res)
+                        manifest[name] = {"output": res, "key": key, "reused": r}
+                except Exception as e:
+                    print(f"[ERROR] {name}: {e}")
+                    errors += [name]
+
+        with open(os.path.join(dir, f"{self.name}.encode.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+        if errors != []:
+            raise RuntimeError(f"Failed to encode: {', '.join(errors)}")
+        return outputs
+
+    def _replace_painting(self, dir: str, asset: str, name: str) -> tuple[str, Callable, tuple, dict]:
+        path = os.path.join(os.path.dirname(self.meta), "painting", asset)
+        check_dir(dir, "output", "painting")
+        output = os.path.join(dir, "output", "painting", asset)
+        tex2d = self.layers[name].texture2D
+        if unchanged(self.repls[name], (tex2d.m_Width, tex2d.m_Height), lambda: cache.get(tex2d)):
+            print(f"[INFO] Unchanged: painting/{asset}")
+            return None
+        encoder, img, quads = self.encoders["painting"], self.repls[name], None
+        if self.trim and self.layers[name].rawMesh is not None:
+            packed = pack_tiles(img, encoder.block(encoder.target(tex2d.m_TextureFormat)))
+            if packed is not None:
+                img, quads = packed
+                print(f"[INFO] Trimmed painting/{asset}: {self.repls[name].size} -> {img.size}, {len(quads) - 1} tiles")
+        textures = {name: (encoder, img, tex2d.m_TextureFormat)}
+        return f"painting/{asset}", encode_painting, (path, output, quads), textures
+
+    def _replace_face(
+        self, dir: str, adv_mode: bool, is_clip: dict[str, bool], num_workers: int = None
+    ) -> list[tuple[str, Callable, tuple, dict]]:
         layer = self.face_layer
-        prefered = self.asset_manager.prefered(layer)
+        prefered = self.layers[self.asset_manager.prefered()]
 
         base = self.name.removesuffix("_n").lower()
         path = os.path.join(os.path.dirname(self.meta), "paintingface", base)
-        env = UnityPy.load(path)
 
-        layer = self.face_layer
+        ox, oy = self.asset_manager.face_origin
+
+        def box(*x: float) -> tuple[int, int, int, int]:
+            return tuple(round(v) - (ox, oy)[i % 2] for i, v in enumerate(x))
+
+        x, y = layer.posMin + self.bias
+        w, h = layer.sizeDelta
         repls: dict[str, Image.Image] = {}
-        for k, v in tqdm(is_clip.items()):
-            x, y = layer.posMin + self.bias
-            w, h = layer.sizeDelta
-            img = self.repls[k]
-            if not adv_mode:
-                repls[k] = img.crop((x, y, x + w, y + h))
-            else:
-                if v:
-                    rgb = Image.new("RGBA", img.size)
-                    rgb.paste(img.crop((x, y, x + w + 1, y + h + 1)), (round(x), round(y)))
-
-                    a = Image.new("RGBA", img.size)
-                    a.paste(img.crop((x + 1, y + 1, x + w, y + h)), (round(x + 1), round(y + 1)))
-
-                    img = Image.merge("RGBA", [*rgb.split()[:3], a.split()[-1]])
-
-                x, y = prefered.posMin + self.bias
-                w, h = prefered.canvasSize
-                repls[k] = img.crop((x, y, x + w, y + h))
-
-        for _ in filter_env(env, Texture2D, False):
-            tex2d: Texture2D = _.read()
-            if re.match(r"^0|([1-9][0-9]*)$", tex2d.name):
-                img = repls[tex2d.name]
-                tex2d.m_Width, tex2d.m_Height = img.size
-                tex2d.set_image(img.transpose(Image.FLIP_TOP_BOTTOM), TextureFormat.RGBA32)
-                tex2d.save()
-
-        for _ in filter_env(env, Sprite, False):
-            sprite: Sprite = _.read()
-            if re.match(r"^0|([1-9][0-9]*)$", sprite.name):
-                size = repls[sprite.name].size
-                sprite.m_Rect.width, sprite.m_Rect.height = size
-                sprite.m_RD.textureRect.width, sprite.m_RD.textureRect.height = size
-                sprite.save()
+        if not adv_mode:
+            for k in tqdm(is_clip.keys()):
+                repls[k] = self.repls[k].crop(box(x, y, x + w, y + h))
+        else:
+            rgb = box(x, y, x + w + 1, y + h + 1)
+            a = box(x + 1, y + 1, x + w, y + h)
+            px, py = prefered.posMin + self.bias
+            pw, ph = prefered.canvasSize
+            origin = box(px, py)
+            buf = np.zeros((len(is_clip), round(py + ph) - round(py), round(px + pw) - round(px), 4), np.uint8)
+
+            def composite(i: int, k: str, clip: bool) -> Image.Image:
+                img = self.repls[k]
+                if clip:
+                    paste(buf[i], img, rgb, origin, slice(3))
+                    paste(buf[i], img, a, origin, slice(3, 4))
+                else:
+                    paste(buf[i], img, (origin[0], origin[1], img.width, img.height), origin)
+                return Image.fromarray(buf[i], "RGBA")
+
+            with ThreadPoolExecutor(num_workers, thread_name_prefix="face") as executor:
+                futures = {k: executor.submit(composite, i, k, v) for i, (k, v) in enumerate(is_clip.items())}
+                for k in tqdm(futures):
+                    repls[k] = futures[k].result()
 
         check_dir(dir, "output", "paintingface")
         output = os.path.join(dir, "output", "paintingface", base)
-        with open(output, "wb") as f:
-            f.write(env.file.save("original"))
-
+        rects, textures = {}, {}
+        for k, v in repls.items():
+            if unchanged(v, self.asset_manager.face_size(k), lambda: self.faces[k]):
+                continue
+            rects[k] = (*v.size, 0, 0)
+            if self.trim_faces:
+                v, rects[k] = trim_face(v)
+            textures[k] = (self.encoders["face"], v, self.asset_manager.face_textures()[k].m_TextureFormat)
+        if self.trim_faces and textures != {}:
+            before = sum([w * h for w, h, _, _ in rects.values()])
+            after = sum([x[1].width * x[1].height for x in textures.values()])
+            print(f"[INFO] Trimmed paintingface/{base}: {before} -> {after} texels")
+        tasks = []
+        if textures != {}:
+            tasks += [(f"paintingface/{base}", encode_face, (path, output, rects), textures)]
+        else:
+            print(f"[INFO] Unchanged: paintingface/{base}")
         if not adv_mode:
-            return [output]
+            return tasks
 
-        env = UnityPy.load(self.meta)
-        cab = list(env.cabs.values())[0]
-        face_rt = cab.objects[layer.pathId]
-        face = face_rt.read_typetree()
         w, h = prefered.canvasSize
         px, py = prefered.pivot
         fix = (prefered.canvasSize - prefered.sizeDelta) * prefered.pivot
         x1, y1 = prefered.posPivot - layer.parent.posPivot + fix
         x2, y2 = prefered.posPivot - layer.posAnchor + self.bias + fix
-        face["m_SizeDelta"] = {"x": w, "y": h}
-        face["m_Pivot"] = {"x": px, "y": py}
-        face["m_LocalPosition"] = {"x": x1, "y": y1, "z": 0.0}
-        face["m_AnchoredPosition"] = {"x": x2, "y": y2}
-        face_rt.save_typetree(face)
+        rt = {
+            "m_SizeDelta": {"x": w, "y": h},
+            "m_Pivot": {"x": px, "y": py},
+            "m_LocalPosition": {"x": x1, "y": y1, "z": 0.0},
+            "m_AnchoredPosition": {"x": x2, "y": y2},
+        }
 
         check_dir(dir, "output", "painting")
         meta = os.path.join(dir, "output", "painting", os.path.basename(self.meta))
-        with open(meta, "wb") as f:
-            f.write(env.file.save("original"))
-
-        return [meta, output]
+        return [
+            (f"painting/{os.path.basename(self.meta)}", encode_face_rt, (self.meta, meta, layer.pathId, rt), {})
+        ] + tasks
 
-    def _replace_icon(self, dir: str, kind: str):
+    def _replace_icon(self, dir: str, kind: str) -> Optional[tuple[str, Callable, tuple, dict]]:
         base = self.name.removesuffix("_n").lower()
         path = os.path.join(os.path.dirname(self.meta), kind, base)
         if not os.path.exists(path):
             return
 
-        env = UnityPy.load(path)
-        preset = IconPreset.default()[kind]
-        mod = False
-        for v in env.container.values():
-            img = self.repls[kind]
-            tex2d_size = aspect_ratio(preset, *img.size, False)
-            sprite_size = aspect_ratio(preset, *img.size, True)
-            sub = Image.new("RGBA", tex2d_size)
-            sub.paste(img.crop((0, 0, *sprite_size)))
-
-            sprite: Sprite = v.read()
-            tex2d: Texture2D = sprite.m_RD.texture.read()
-            tex2d.set_image(sub.resize(tex2d.image.size), TextureFormat.RGBA32)
-            tex2d.save()
-            mod = True
-            break
-
-        if mod:
-            check_dir(dir, "output", kind)
-            outdir = os.path.join(dir, "output", kind)
-            path = os.path.join(outdir, base)
-            with open(path, "wb") as f:
-                f.write(env.file.save("original"))
-            return path
+        check_dir(dir, "output", kind)
+        output = os.path.join(dir, "output", kind, base)
+        return f"{kind}/{base}", encode_icon, (path, output, kind, self.repls[kind], self.encoders["icon"]), {}
@@ -0,0 +1,110 @@
+import contextlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterator
+
+import UnityPy
+from UnityPy import Environment
+
+
+class EnvironmentPool:
+    def __init__(self, capacity: int = 1 << 30):
+        self.capacity = capacity
+        self.envs: OrderedDict[str, tuple[Environment, dict[str, float], int]] = OrderedDict()
+        self.aliases: dict[str, str] = {}
+        self.lock = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(path: str) -> str:
+        return os.path.normcase(os.path.abspath(path))
+
+    @staticmethod
+    def stat(files: dict[str, float]) -> dict[str, float]:
+        try:
+            return {x: os.path.getmtime(x) for x in files}
+        except OSError:
+            return {}
+
+    @staticmethod
+    def resident(item) -> int:
+        if getattr(item, "files", None):
+            return sum([EnvironmentPool.resident(x) for x in item.files.values()])
+        return getattr(getattr(item, "reader", item), "Length", 0)
+
+    def _lookup(self, key: str) -> Environment:
+        owner = self.aliases.get(key, key)
+        if owner in self.envs:
+            env, files, _ = self.envs[owner]
+            if self.stat(files) == files:
+                self.envs.move_to_end(owner)
+                return env
+            self._drop(owner)
+
+    def _drop(self, key: str):
+        self.envs.pop(key, None)
+        self.aliases = {k: v for k, v in self.aliases.items() if v != key}
+
+    def get(self, path: str) -> Environment:
+        key = self.key(path)
+        with self.lock:
+            env = self._lookup(key)
+            if env is not None:
+                return env
+
+        env = UnityPy.load(path)
+        with self.lock:
+            self.envs[key] = env, self.stat({key: 0}), self.resident(env)
+            self.evict()
+        return env
+
+    def attach(self, path: str, dep: str) -> Environment:
+        env = self.get(path)
+        if dep not in env.files:
+            env.load_file(dep)
+        with self.lock:
+            key = self.key(path)
+            if key in self.envs and self.envs[key][0] is env:
+                files = self.envs[key][1] | self.stat({self.key(dep): 0})
+                self.envs[key] = env, files, self.resident(env)
+                self.aliases[self.key(dep)] = key
+                self.evict()
+        return env
+
+    def name(self, env: Environment, path: str) -> str:
+        return next(k for k in env.files if self.key(k) == self.key(path))
+
+    def usage(self) -> int:
+        return sum([x[2] for x in self.envs.values()])
+
+    def evict(self):
+        while len(self.envs) > 1 and self.usage() > self.capacity:
+            self._drop(next(iter(self.envs)))
+
+    @contextlib.contextmanager
+    def borrow(self, path: str) -> Iterator[Environment]:
+        try:
+            yield self.get(path)
+        finally:
+            self.release(path)
+
+    def release(self, path: str):
+        key = self.key(path)
+        with self.lock:
+            if key in self.aliases:
+                del self.aliases[key]
+            else:
+                self._drop(key)
+
+    def clear(self):
+        with self.lock:
+            self.envs.clear()
+            self.aliases.clear()
+
+
+pool = EnvironmentPool()
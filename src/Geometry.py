@@ -0,0 +1,58 @@
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+from .Vector import Vector2
+
+if TYPE_CHECKING:
+    from .Layer import Layer
+
+
+class Geometry:
+    def __init__(self, root: "Layer"):
+        layers = root.walk()
+        self.rows = {x.pathId: i for i, x in enumerate(layers)}
+
+        def vec(x: Optional[Vector2]) -> tuple[float, float]:
+            return (np.nan, np.nan) if x is None else x.tuple()
+
+        self.parent = np.array([-1 if x.parent is None else self.rows[x.parent.pathId] for x in layers])
+        self.depth = np.array([x.depth for x in layers])
+        self.localPosition = np.array([vec(x.localPosition) for x in layers], dtype=np.float64)
+        self.sizeDelta = np.array([vec(x.sizeDelta) for x in layers], dtype=np.float64)
+        self.pivot = np.array([vec(x.pivot) for x in layers], dtype=np.float64)
+        self.meshSize = np.array([vec(x.meshSize) for x in layers], dtype=np.float64)
+        self.rawSpriteSize = np.array([vec(x.rawSpriteSize) for x in layers], dtype=np.float64)
+
+        mesh_area = np.prod(self.meshSize, axis=1)
+        raw_area = np.prod(self.rawSpriteSize, axis=1)
+        use_mesh = np.isnan(raw_area) | (mesh_area > raw_area)
+        self.spriteSize = np.where(use_mesh[:, None], self.meshSize, self.rawSpriteSize)
+
+        sprite_area = np.prod(self.spriteSize, axis=1)
+        delta_area = np.prod(self.sizeDelta, axis=1)
+        use_sprite = ~np.isnan(sprite_area) & (sprite_area > delta_area)
+        self.canvasSize = np.where(use_sprite[:, None], self.spriteSize, self.sizeDelta)
+
+        self.posPivot = np.zeros_like(self.localPosition)
+        for d in range(2, self.depth.max(initial=1) + 1):
+            idx = np.flatnonzero(self.depth == d)
+            self.posPivot[idx] = self.posPivot[self.parent[idx]] + self.localPosition[idx]
+
+        self.posMin = self.posPivot - self.sizeDelta * self.pivot
+        self.posMax = self.posMin + self.canvasSize
+
+    def row(self, layer: "Layer") -> int:
+        return self.rows[layer.pathId]
+
+    def get(self, attr: str, layer: "Layer") -> Optional[Vector2]:
+        val = getattr(self, attr)[self.row(layer)]
+        if np.isnan(val).any():
+            return None
+        return Vector2(*val.tolist())
+
+    def bounds(self, layers: list["Layer"]) -> tuple[float, float, float, float]:
+        idx = [self.row(x) for x in layers]
+        x_min, y_min = self.posMin[idx].min(axis=0).tolist()
+        x_max, y_max = self.posMax[idx].max(axis=0).tolist()
+        return x_min, y_min, x_max, y_max
@@ -1,6 +1,6 @@
 from typing import Callable, Optional
 
-from PIL import Image
+import numpy as np
 from typing_extensions import Self
 from UnityPy.classes import (
     GameObject,
@@ -14,7 +14,7 @@ from UnityPy.classes import (
 from UnityPy.enums import ClassIDType
 from UnityPy.math import Quaternion, Vector3
 
-from .utility import prod
+from .Geometry import Geometry
 from .Vector import Vector2
 
 
@@ -22,6 +22,7 @@ class Layer:
     def __init__(self, rt: RectTransform, parent: Self = None):
         self.rt = rt
         self.parent = parent
+        self.root: Self = self if parent is None else parent.root
         self.depth = 1 if parent is None else parent.depth + 1
         self.child: list[Self] = [Layer(x.read(), self) for x in rt.m_Children]
 
@@ -61,6 +62,9 @@ class Layer:
                 return x
         return None
 
+    def walk(self) -> list[Self]:
+        return [self] + [y for x in self.child for y in x.walk()]
+
     def flatten(self):
         res = {}
         if self.sprite is not None:
@@ -70,13 +74,6 @@ class Layer:
             res |= x.flatten()
         return res
 
-    def contain(self, l: float, b: float, r: float, t: float) -> bool:
-        if l < self.posMin[0] or b < self.posMin[1]:
-            return False
-        if r > self.posMax[0] or t > self.posMax[1]:
-            return False
-        return True
-
     def fetch(attr: str):
         attrs = ["m_AnchorMin", "m_AnchorMax", "m_AnchoredPosition", "m_SizeDelta", "m_Pivot"]
 
@@ -94,6 +91,12 @@ class Layer:
 
         return decor
 
+    @property
+    def geometry(self) -> Geometry:
+        if not hasattr(self.root, "_geometry"):
+            setattr(self.root, "_geometry", Geometry(self.root))
+        return getattr(self.root, "_geometry")
+
     @property
     def name(self) -> str:
         return self.gameObject.name if self.gameObject else ""
@@ -212,81 +215,65 @@ class Layer:
 
     @property
     def posPivot(self) -> Vector2:
-        if self.parent is None:
-            return Vector2.zero()
-        return self.parent.posPivot + self.localPosition
+        return self.geometry.get("posPivot", self)
 
     @property
     def posMin(self) -> Vector2:
-        return self.posPivot - self.sizeDelta * self.pivot
+        return self.geometry.get("posMin", self)
 
     @property
     def posMax(self) -> Vector2:
-        return self.posMin + self.canvasSize
+        return self.geometry.get("posMax", self)
 
     @property
     def box(self) -> tuple[float, float, float, float]:
         return *self.posMin, *self.posMax
 
     @property
-    def mesh(self) -> list[tuple]:
-        if not hasattr(self, "_mesh"):
+    def meshArrays(self) -> Optional[tuple[np.ndarray, np.ndarray]]:
+        if not hasattr(self, "_mesh_arrays"):
             if self.texture2D is None:
-                setattr(self, "_mesh", None)
+                setattr(self, "_mesh_arrays", None)
             else:
-                w, h = self.texture2D.image.size
-                val = []
+                w, h = self.texture2D.m_Width, self.texture2D.m_Height
                 if self.rawMesh is None:
-                    val += [((0, 0, w, h), (0, 0, 0, h, w, h, w, 0))]
+                    box = np.array([[0, 0, w, h]])
+                    quad = np.array([[0, 0, 0, h, w, h, w, 0]])
                 else:
-                    v = self.rawMesh.m_Vertices
-                    v = [(round(v[i]), round(v[i + 1])) for i in range(0, len(v), 3)]
-                    t = self.rawMesh.m_UV0
-                    t = [(round(t[i] * w), round(t[i + 1] * h)) for i in range(0, len(t), 2)]
-                    f = self.rawMesh.m_Indices
-                    for i in range(0, len(f), 6):
-                        val += [
-                            (
-                                (*v[f[i]], *v[f[i + 3]]),
-                                (*t[f[i]], *t[f[i + 1]], *t[f[i + 3]], *t[f[i + 4]]),
-                            )
-                        ]
-                setattr(self, "_mesh", val)
-        return getattr(self, "_mesh")
+                    v = np.asarray(self.rawMesh.m_Vertices, dtype=np.float64).reshape(-1, 3)
+                    v = np.round(v[:, :2]).astype(np.int64)
+                    t = np.asarray(self.rawMesh.m_UV0, dtype=np.float64).reshape(-1, 2)
+                    t = np.round(t * (w, h)).astype(np.int64)
+                    f = np.asarray(self.rawMesh.m_Indices, dtype=np.int64).reshape(-1, 6)
+                    box = np.concatenate([v[f[:, 0]], v[f[:, 3]]], axis=1)
+                    quad = np.concatenate([t[f[:, 0]], t[f[:, 1]], t[f[:, 3]], t[f[:, 4]]], axis=1)
+                setattr(self, "_mesh_arrays", (box, quad))
+        return getattr(self, "_mesh_arrays")
 
     @property
-    def tex(self) -> Image.Image:
-        if not hasattr(self, "_tex"):
-            img = self.texture2D.image.transpose(Image.FLIP_TOP_BOTTOM)
-            setattr(self, "_tex", img)
-        return getattr(self, "_tex")
+    def mesh(self) -> Optional[list[tuple]]:
+        if not hasattr(self, "_mesh"):
+            if self.meshArrays is None:
+                setattr(self, "_mesh", None)
+            else:
+                box, quad = self.meshArrays
+                setattr(self, "_mesh", [(tuple(x), tuple(y)) for x, y in zip(box.tolist(), quad.tolist())])
+        return getattr(self, "_mesh")
 
     @property
     def meshSize(self) -> Vector2:
         if not hasattr(self, "_mesh_size"):
-            if self.mesh is None:
+            if self.meshArrays is None:
                 setattr(self, "_mesh_size", None)
             else:
-                v = [x[0] for x in self.mesh]
-                w = max([x[2] for x in v]) + 1
-                h = max([x[3] for x in v]) + 1
+                w, h = (self.meshArrays[0][:, 2:].max(axis=0) + 1).tolist()
                 setattr(self, "_mesh_size", Vector2(w, h))
         return getattr(self, "_mesh_size")
 
     @property
-    def spriteSize(self) -> Vector2:
-        if self.rawSpriteSize is None:
-            return self.meshSize
-        elif prod(self.meshSize) > prod(self.rawSpriteSize):
-            return self.meshSize
-        else:
-            return self.rawSpriteSize
+    def spriteSize(self) -> Optional[Vector2]:
+        return self.geometry.get("spriteSize", self)
 
     @property
     def canvasSize(self) -> Vector2:
-        if self.spriteSize is None:
-            return self.sizeDelta
-        elif prod(self.spriteSize) > prod(self.sizeDelta):
-            return self.spriteSize
-        else:
-            return self.sizeDelta
+        return self.geometry.get("canvasSize", self)
@@ -0,0 +1,103 @@
+import os
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from PIL import Image
+
+
+class LayerWriter(ABC):
+    ext = ""
+
+    def __init__(self, path: str, num_workers: int = None):
+        self.path = path
+        self.executor = ThreadPoolExecutor(num_workers, thread_name_prefix="layer")
+        self.window = 2 * (num_workers or os.cpu_count())
+        self.pending: deque[dict] = deque()
+        self.groups: list[dict] = []
+        self.boxes: list[tuple[int, int, int, int]] = []
+        self.stack: list[list[dict]] = [[]]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.executor.shutdown(cancel_futures=True)
+        self.release()
+
+    def add_layer(self, img: Image.Image, name: str, top: int, left: int, visible: bool = True):
+        img = img.convert("RGBA")
+        if img.getchannel("A").getbbox() is None:
+            img = img.crop((0, 0, 0, 0))
+
+        record = {
+            "kind": "layer",
+            "name": name,
+            "box": (top, left, top + img.height, left + img.width),
+            "visible": visible,
+            "group": [x["name"] for x in self.groups],
+        }
+        record["data"] = self.submit(img, record)
+        self._add(record)
+
+    def begin_group(self, name: str, visible: bool = True, closed: bool = False):
+        group = {"name": name, "visible": visible, "closed": closed, "group": [x["name"] for x in self.groups]}
+        self.groups += [group]
+        self._add({"kind": "begin", **group})
+
+    def end_group(self):
+        self._add({"kind": "end", **self.groups.pop()})
+
+    @abstractmethod
+    def submit(self, img: Image.Image, record: dict):
+        pass
+
+    @abstractmethod
+    def write(self, record: dict):
+        pass
+
+    def release(self):
+        pass
+
+    @staticmethod
+    def placeholder(img: Image.Image) -> Image.Image:
+        return Image.new("RGBA", (1, 1)) if img.width * img.height == 0 else img
+
+    def bounds(self) -> tuple[int, int, int, int]:
+        boxes = [_ for _ in self.boxes if _[0] < _[2] and _[1] < _[3]]
+        if boxes == []:
+            raise ValueError("No images found in layers")
+        top = min([_[0] for _ in boxes])
+        left = min([_[1] for _ in boxes])
+        bottom = max([_[2] for _ in boxes])
+        right = max([_[3] for _ in boxes])
+        return top, left, bottom, right
+
+    def tree(self) -> list[dict]:
+        return self.stack[0]
+
+    def _add(self, record: dict):
+        self.pending.append(record)
+        while len(self.pending) > self.window:
+            self._flush()
+
+    def _flush(self):
+        record = self.pending.popleft()
+        if isinstance(record.get("data"), Future):
+            record["data"] = record["data"].result()
+        self.write(record)
+        record.pop("data", None)
+
+        if record["kind"] == "layer":
+            self.boxes += [record["box"]]
+            self.stack[-1] += [record]
+        elif record["kind"] == "begin":
+            self.stack += [[]]
+        else:
+            children = self.stack.pop()
+            self.stack[-1] += [{**record, "children": children}]
+
+    def close(self):
+        while len(self.pending) > 0:
+            self._flush()
+        self.executor.shutdown()
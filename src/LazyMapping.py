@@ -0,0 +1,37 @@
+import threading
+from collections.abc import Mapping
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterator
+
+
+class LazyMapping(Mapping):
+    executor: Executor = None
+
+    def __init__(self, loaders: dict[str, Callable[[], Any]] = None):
+        self.loaders = {} if loaders is None else loaders
+        self.cache: dict[str, Any] = {}
+        self.locks = {k: threading.Lock() for k in self.loaders}
+
+    def __repr__(self) -> str:
+        items = [f"{k}: {'<loaded>' if k in self.cache else '<pending>'}" for k in self.loaders]
+        return f"LazyMapping({', '.join(items)})"
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.cache:
+            with self.locks[key]:
+                if key not in self.cache:
+                    self.cache[key] = self.loaders[key]()
+        return self.cache[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.loaders)
+
+    def __len__(self) -> int:
+        return len(self.loaders)
+
+    def prefetch(self, executor: Executor = None) -> list[Future]:
+        if executor is None:
+            if LazyMapping.executor is None:
+                LazyMapping.executor = ThreadPoolExecutor(thread_name_prefix="prefetch")
+            executor = LazyMapping.executor
+        return [executor.submit(self.__getitem__, k) for k in self.loaders if k not in self.cache]
@@ -0,0 +1,57 @@
+import contextlib
+import json
+import os
+import sqlite3
+from typing import Iterator, Optional
+
+from .utility import cache_path, check_dir
+
+
+class MetaIndex:
+    VERSION = 2
+
+    def __init__(self, path: str = None):
+        self.path = cache_path("metadata.db") if path is None else path
+
+    @contextlib.contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        dir = os.path.dirname(self.path)
+        if dir != "":
+            check_dir(dir)
+        con = sqlite3.connect(self.path, timeout=30)
+        try:
+            with con:
+                con.execute("CREATE TABLE IF NOT EXISTS meta (path TEXT PRIMARY KEY, record TEXT)")
+                yield con
+        finally:
+            con.close()
+
+    @staticmethod
+    def stamp(files: list[str]) -> list:
+        res = [MetaIndex.VERSION]
+        for x in files:
+            if os.path.exists(x):
+                stat = os.stat(x)
+                res += [[x, stat.st_size, stat.st_mtime_ns]]
+            else:
+                res += [[x, None, None]]
+        return res
+
+    def get(self, file: str) -> Optional[dict]:
+        path = os.path.abspath(file)
+        with self.connect() as con:
+            row = con.execute("SELECT record FROM meta WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return None
+
+        record = json.loads(row[0])
+        if record["stamp"] != self.stamp(record["files"]):
+            return None
+        return record
+
+    def put(self, file: str, record: dict, files: list[str]):
+        path = os.path.abspath(file)
+        files = [os.path.abspath(_) for _ in [file] + files]
+        record = record | {"files": files, "stamp": self.stamp(files)}
+        with self.connect() as con:
+            con.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (path, json.dumps(record, ensure_ascii=False)))
@@ -0,0 +1,5 @@
+from .PngWriter import PngWriter
+
+
+class NpyWriter(PngWriter):
+    suffix = ".npy"
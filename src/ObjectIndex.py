@@ -0,0 +1,55 @@
+from typing import Optional
+
+from UnityPy import Environment
+from UnityPy.files import ObjectReader
+
+
+class ObjectIndex:
+    def __init__(self, env: Environment):
+        self.env = env
+        self.files: dict[str, dict[str, list[ObjectReader]]] = {}
+        self.reads: dict[int, object] = {}
+        self.names: dict[tuple[str, Optional[str]], dict[str, list]] = {}
+
+    @staticmethod
+    def of(env: Environment) -> "ObjectIndex":
+        if not hasattr(env, "_object_index"):
+            setattr(env, "_object_index", ObjectIndex(env))
+        return getattr(env, "_object_index")
+
+    def update(self):
+        def search(item) -> list[ObjectReader]:
+            if not isinstance(item, Environment) and getattr(item, "objects", None):
+                return list(item.objects.values())
+            elif getattr(item, "files", None):
+                return [x for y in item.files.values() for x in search(y)]
+            return []
+
+        for k, v in self.env.files.items():
+            if k not in self.files:
+                table: dict[str, list[ObjectReader]] = {}
+                for x in search(v):
+                    table.setdefault(x.type.name, []).append(x)
+                self.files[k] = table
+                self.names = {}
+
+    def objects(self, type: type, file: str = None) -> list[ObjectReader]:
+        self.update()
+        tables = self.files.values() if file is None else [self.files[file]]
+        return [x for table in tables for x in table.get(type.__name__, [])]
+
+    def read(self, obj: ObjectReader):
+        key = id(obj)
+        if key not in self.reads:
+            self.reads[key] = obj.read()
+        return self.reads[key]
+
+    def get(self, type: type, name: str, file: str = None) -> list:
+        key = (type.__name__, file)
+        if key not in self.names:
+            table: dict[str, list] = {}
+            for x in self.objects(type, file):
+                y = self.read(x)
+                table.setdefault(getattr(y, "name", None), []).append(y)
+            self.names[key] = table
+        return self.names[key].get(name, [])
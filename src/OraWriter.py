@@ -0,0 +1,82 @@
+import io
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import Future
+
+from PIL import Image
+
+from .LayerWriter import LayerWriter
+
+
+def encode_png(img: Image.Image) -> bytes:
+    with io.BytesIO() as buf:
+        img.save(buf, "PNG")
+        return buf.getvalue()
+
+
+class OraWriter(LayerWriter):
+    ext = ".ora"
+
+    def __init__(self, path: str, num_workers: int = None):
+        super().__init__(path, num_workers)
+        self.zip = zipfile.ZipFile(path, "w", zipfile.ZIP_STORED)
+        self.zip.writestr("mimetype", "image/openraster")
+        self.merged: Image.Image = None
+        self.origin = (0, 0)
+
+    def submit(self, img: Image.Image, record: dict) -> Future:
+        visible = record["visible"] and all([x["visible"] for x in self.groups])
+        record["image"] = img if visible and img.width * img.height > 0 else None
+        return self.executor.submit(encode_png, self.placeholder(img))
+
+    def write(self, record: dict):
+        if record["kind"] != "layer":
+            return
+
+        record["src"] = f"data/{len(self.boxes):04d}.png"
+        self.zip.writestr(record["src"], record["data"])
+        img = record.pop("image")
+        if img is not None:
+            self._merge(img, *record["box"][:2])
+
+    def _merge(self, img: Image.Image, top: int, left: int):
+        if self.merged is None:
+            self.merged, self.origin = Image.new("RGBA", img.size), (top, left)
+        t0, l0 = self.origin
+        t, l = min(t0, top), min(l0, left)
+        b = max(t0 + self.merged.height, top + img.height)
+        r = max(l0 + self.merged.width, left + img.width)
+        if (t, l, b, r) != (t0, l0, t0 + self.merged.height, l0 + self.merged.width):
+            canvas = Image.new("RGBA", (r - l, b - t))
+            canvas.paste(self.merged, (l0 - l, t0 - t))
+            self.merged, self.origin = canvas, (t, l)
+        self.merged.alpha_composite(img, (left - l, top - t))
+
+    def release(self):
+        self.zip.close()
+
+    def close(self):
+        super().close()
+        top, left, bottom, right = self.bounds()
+
+        def build(parent: ET.Element, records: list[dict]):
+            for x in reversed(records):
+                attrib = {"name": x["name"], "visibility": "visible" if x["visible"] else "hidden"}
+                if "children" in x:
+                    build(ET.SubElement(parent, "stack", attrib, isolation="auto"), x["children"])
+                else:
+                    pos = {"x": str(x["box"][1] - left), "y": str(x["box"][0] - top)}
+                    ET.SubElement(parent, "layer", attrib, src=x["src"], **pos)
+
+        image = ET.Element("image", version="0.0.5", w=str(right - left), h=str(bottom - top))
+        build(ET.SubElement(image, "stack"), self.tree())
+        self.zip.writestr("stack.xml", ET.tostring(image, encoding="UTF-8", xml_declaration=True))
+
+        merged = Image.new("RGBA", (right - left, bottom - top))
+        if self.merged is not None:
+            merged.paste(self.merged, (self.origin[1] - left, self.origin[0] - top))
+        self.zip.writestr("mergedimage.png", encode_png(merged))
+        merged.thumbnail((256, 256))
+        self.zip.writestr("Thumbnails/thumbnail.png", encode_png(merged))
+
+        self.zip.close()
@@ -0,0 +1,47 @@
+import json
+import os
+from concurrent.futures import Future
+
+from PIL import Image
+
+from .LayerWriter import LayerWriter
+from .utility import check_dir, write_img
+
+
+class PngWriter(LayerWriter):
+    ext = ""
+    suffix = ".png"
+
+    def __init__(self, path: str, num_workers: int = None):
+        super().__init__(path, num_workers)
+        check_dir(path)
+
+    def submit(self, img: Image.Image, record: dict) -> Future:
+        record["src"] = os.path.join(*record["group"], record["name"] + self.suffix)
+        path = os.path.join(self.path, record["src"])
+        check_dir(os.path.dirname(path))
+        return self.executor.submit(write_img, self.placeholder(img), path)
+
+    def write(self, record: dict):
+        pass
+
+    def close(self):
+        super().close()
+        top, left, bottom, right = self.bounds()
+
+        def build(records: list[dict]) -> list[dict]:
+            layers = []
+            for x in reversed(records):
+                layer = {"name": x["name"], "visible": x["visible"]}
+                if "children" in x:
+                    layer["layers"] = build(x["children"])
+                else:
+                    layer["src"] = x["src"].replace(os.sep, "/")
+                    layer["x"], layer["y"] = x["box"][1] - left, x["box"][0] - top
+                    layer["width"], layer["height"] = x["box"][3] - x["box"][1], x["box"][2] - x["box"][0]
+                layers += [layer]
+            return layers
+
+        layout = {"width": right - left, "height": bottom - top, "layers": build(self.tree())}
+        with open(os.path.join(self.path, "layout.json"), "w", encoding="utf-8") as f:
+            json.dump(layout, f, indent=2, ensure_ascii=False)
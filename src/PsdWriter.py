@@ -0,0 +1,179 @@
+import os
+import shutil
+import struct
+import tempfile
+from concurrent.futures import Future
+
+import numpy as np
+from PIL import Image
+
+from .LayerWriter import LayerWriter
+
+
+def packbits(channel: np.ndarray, block: int = 256) -> tuple[np.ndarray, bytes]:
+    h, w = channel.shape
+    counts, chunks = [], []
+    for i in range(0, h, block):
+        count, chunk = _packbits(np.ascontiguousarray(channel[i : i + block]))
+        counts += [count]
+        chunks += [chunk]
+    return np.concatenate(counts).astype(">u2"), b"".join(chunks)
+
+
+def _packbits(channel: np.ndarray) -> tuple[np.ndarray, bytes]:
+    h, w = channel.shape
+    flat = channel.ravel()
+    n = flat.size
+
+    start = np.ones(n, dtype=bool)
+    start[1:] = flat[1:] != flat[:-1]
+    start[::w] = True
+    starts = np.flatnonzero(start)
+    lengths = np.diff(np.append(starts, n))
+    rep = lengths >= 2
+
+    new_row = np.ones(len(starts), dtype=bool)
+    new_row[1:] = starts[1:] // w != starts[:-1] // w
+    prev_rep = np.ones(len(starts), dtype=bool)
+    prev_rep[1:] = rep[:-1]
+    seg_start = rep | prev_rep | new_row
+    seg = np.cumsum(seg_start) - 1
+    first = np.flatnonzero(seg_start)
+
+    seg_len = np.bincount(seg, weights=lengths).astype(np.int64)
+    seg_rep = rep[first]
+    seg_pos = starts[first]
+    seg_val = flat[seg_pos]
+
+    num = (seg_len + 127) // 128
+    pk_seg = np.repeat(np.arange(len(first)), num)
+    pk_j = np.arange(len(pk_seg)) - np.repeat(np.cumsum(num) - num, num)
+    pk_n = np.minimum(128, seg_len[pk_seg] - 128 * pk_j)
+    pk_rep = seg_rep[pk_seg]
+    size = np.where(pk_rep, 2, 1 + pk_n)
+    offset = np.cumsum(size) - size
+
+    out = np.empty(int(size.sum()), dtype=np.uint8)
+    out[offset] = np.where(pk_rep, (257 - pk_n) & 0xFF, pk_n - 1)
+    out[offset[pk_rep] + 1] = seg_val[pk_seg[pk_rep]]
+
+    lit = ~pk_rep
+    src = np.flatnonzero(np.repeat(~rep, lengths))
+    delta = offset[lit] + 1 - (seg_pos[pk_seg[lit]] + 128 * pk_j[lit])
+    out[src + np.repeat(delta, pk_n[lit])] = flat[src]
+
+    counts = np.bincount(seg_pos[pk_seg] // w, weights=size, minlength=h)
+    return counts.astype(">u2"), out.tobytes()
+
+
+def compress(channel: np.ndarray, compression: str = "rle") -> bytes:
+    if compression == "raw" or channel.size == 0:
+        return struct.pack(">H", 0) + channel.tobytes()
+    counts, packed = packbits(channel)
+    return struct.pack(">H", 1) + counts.tobytes() + packed
+
+
+def pascal(name: str) -> bytes:
+    data = name.encode("ascii", "replace")[:255]
+    data = bytes([len(data)]) + data
+    return data + b"\x00" * (-len(data) % 4)
+
+
+def tagged(key: bytes, data: bytes) -> bytes:
+    data += b"\x00" * (len(data) % 2)
+    return b"8BIM" + key + struct.pack(">I", len(data)) + data
+
+
+class PsdWriter(LayerWriter):
+    ext = ".psd"
+
+    def __init__(self, path: str, num_workers: int = None, compression: str = "rle"):
+        assert compression in ["rle", "raw"], f"Unknown compression: {compression}"
+        super().__init__(path, num_workers)
+        self.compression = compression
+        self.spool = tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(path)))
+        self.records: list[dict] = []
+
+    def submit(self, img: Image.Image, record: dict) -> list[tuple[int, Future]]:
+        data = np.asarray(img)
+        return [
+            (id, self.executor.submit(compress, data[..., i], self.compression))
+            for id, i in [(-1, 3), (0, 0), (1, 1), (2, 2)]
+        ]
+
+    def write(self, record: dict):
+        if record["kind"] == "layer":
+            box, section = record["box"], None
+            channels = [(id, x.result()) for id, x in record["data"]]
+        else:
+            box, section = None, 3 if record["kind"] == "begin" else 2 if record["closed"] else 1
+            channels = [(id, struct.pack(">H", 0)) for id in [-1, 0, 1, 2]]
+
+        for _, data in channels:
+            self.spool.write(data)
+        self.records += [
+            {
+                "name": "</Layer group>" if section == 3 else record["name"],
+                "box": box,
+                "visible": record["visible"],
+                "channels": [(id, len(data)) for id, data in channels],
+                "section": section,
+            }
+        ]
+
+    def release(self):
+        self.spool.close()
+
+    def _record(self, record: dict, dy: int, dx: int) -> bytes:
+        if record["box"] is None:
+            top = left = bottom = right = 0
+        else:
+            top, left, bottom, right = record["box"]
+            top, left, bottom, right = top + dy, left + dx, bottom + dy, right + dx
+
+        data = struct.pack(">iiiiH", top, left, bottom, right, len(record["channels"]))
+        for id, length in record["channels"]:
+            data += struct.pack(">hI", id, length)
+
+        flags = 0 if record["visible"] else 0x02
+        if record["section"] is not None:
+            flags |= 0x18
+        blend = b"norm" if record["section"] in [None, 3] else b"pass"
+        data += b"8BIM" + blend + struct.pack(">BBBB", 255, 0, flags, 0)
+
+        name = record["name"]
+        extra = struct.pack(">II", 0, 0) + pascal(name)
+        extra += tagged(b"luni", struct.pack(">I", len(name)) + name.encode("utf-16-be"))
+        if record["section"] is not None:
+            extra += tagged(b"lsct", struct.pack(">I", record["section"]))
+        return data + struct.pack(">I", len(extra)) + extra
+
+    def close(self):
+        super().close()
+        top, left, bottom, right = self.bounds()
+        height, width = bottom - top, right - left
+
+        records = b"".join([self._record(_, -top, -left) for _ in self.records])
+        size = 2 + len(records) + self.spool.tell()
+        pad = size % 2
+
+        with open(self.path, "wb") as f:
+            f.write(b"8BPS" + struct.pack(">H6xHIIHH", 1, 3, height, width, 8, 3))
+            f.write(struct.pack(">II", 0, 0))
+            f.write(struct.pack(">IIh", size + pad + 8, size + pad, len(self.records)))
+            f.write(records)
+            self.spool.seek(0)
+            shutil.copyfileobj(self.spool, f)
+            f.write(b"\x00" * pad + struct.pack(">I", 0))
+
+            if self.compression == "raw":
+                f.write(struct.pack(">H", 0))
+                row = bytes(width)
+                for _ in range(height * 3):
+                    f.write(row)
+            else:
+                counts, packed = packbits(np.zeros((1, width), dtype=np.uint8))
+                f.write(struct.pack(">H", 1) + counts.tobytes() * height * 3)
+                f.write(packed * height * 3)
+
+        self.spool.close()
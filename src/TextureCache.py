@@ -0,0 +1,129 @@
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+from UnityPy.classes import Texture2D
+
+from .utility import cache_path
+
+
+class TextureCache:
+    def __init__(self, name: str = "texture", capacity: int = 4 << 30):
+        self.name = name
+        self.capacity = capacity
+        self.usage: int = None
+        self.counted: str = None
+        self.lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return cache_path(self.name)
+
+    @property
+    def enabled(self) -> bool:
+        return os.environ.get("ALTH_TEXTURE_CACHE", "1") != "0"
+
+    @staticmethod
+    def key(tex2d: Texture2D) -> str:
+        sha1 = hashlib.sha1(tex2d.image_data)
+        sha1.update(struct.pack("<iii", int(tex2d.m_TextureFormat), tex2d.m_Width, tex2d.m_Height))
+        return sha1.hexdigest()
+
+    @staticmethod
+    def digest(*parts) -> str:
+        sha1 = hashlib.sha1()
+        for x in parts:
+            if isinstance(x, np.ndarray):
+                sha1.update(repr((x.dtype.str, x.shape)).encode() + np.ascontiguousarray(x).tobytes())
+            elif isinstance(x, bytes):
+                sha1.update(x)
+            else:
+                sha1.update(repr(x).encode())
+        return sha1.hexdigest()
+
+    def file(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key + ".npy")
+
+    def get(self, tex2d: Texture2D) -> Image.Image:
+        if not self.enabled or tex2d.image_data is None or len(tex2d.image_data) == 0:
+            return tex2d.image
+
+        key = self.key(tex2d)
+        img = self.load(key)
+        if img is None:
+            img = tex2d.image
+            self.store(key, img)
+        return img
+
+    def load(self, key: str) -> Optional[Image.Image]:
+        if not self.enabled:
+            return None
+        file = self.file(key)
+        try:
+            data = np.load(file, mmap_mode="r")
+            os.utime(file)
+            return Image.fromarray(data)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, key: str, img: Image.Image):
+        if not self.enabled:
+            return
+        try:
+            self.put(self.file(key), np.asarray(img))
+        except OSError as e:
+            print("[WARNING] Failed to cache texture:", e)
+
+    def put(self, file: str, data: np.ndarray):
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(".tmp", dir=os.path.dirname(file))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, data)
+            os.replace(tmp, file)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        with self.lock:
+            if self.usage is None or self.counted != self.path:
+                self.counted = self.path
+                self.usage = sum([os.path.getsize(x) for x, _ in self.walk()])
+            else:
+                self.usage += os.path.getsize(file)
+            if self.usage > self.capacity:
+                self.evict()
+
+    def walk(self) -> list[tuple[str, float]]:
+        files = []
+        for root, _, names in os.walk(self.path):
+            for x in names:
+                if x.endswith(".npy"):
+                    path = os.path.join(root, x)
+                    try:
+                        files += [(path, os.path.getmtime(path))]
+                    except OSError:
+                        pass
+        return files
+
+    def evict(self):
+        files = sorted(self.walk(), key=lambda x: x[1])
+        self.usage = sum([os.path.getsize(x) for x, _ in files])
+        for x, _ in files:
+            if self.usage <= self.capacity * 3 // 4:
+                break
+            try:
+                size = os.path.getsize(x)
+                os.remove(x)
+                self.usage -= size
+            except OSError:
+                pass
+
+
+cache = TextureCache()
+layer_cache = TextureCache("layer")
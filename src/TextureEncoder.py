@@ -0,0 +1,129 @@
+from concurrent.futures import Executor, Future
+
+import numpy as np
+from PIL import Image
+from UnityPy.classes import Texture2D
+from UnityPy.enums import TextureFormat as TF
+
+Encoded = tuple[bytes, TF, tuple[int, int]]
+
+
+class TextureEncoder:
+    formats = {
+        "RGBA32": TF.RGBA32,
+        "ETC_RGB4": TF.ETC_RGB4,
+        "ETC2_RGB": TF.ETC2_RGB,
+        "ETC2_RGBA8": TF.ETC2_RGBA8,
+        "DXT1": TF.DXT1,
+        "DXT5": TF.DXT5,
+        "BC7": TF.BC7,
+        "ASTC_4x4": TF.ASTC_RGBA_4x4,
+        "ASTC_5x5": TF.ASTC_RGBA_5x5,
+        "ASTC_6x6": TF.ASTC_RGBA_6x6,
+        "ASTC_8x8": TF.ASTC_RGBA_8x8,
+    }
+    aliases = {
+        TF.ETC_RGB4Crunched: TF.ETC_RGB4,
+        TF.ETC2_RGBA8Crunched: TF.ETC2_RGBA8,
+        TF.DXT1Crunched: TF.DXT1,
+        TF.DXT5Crunched: TF.DXT5,
+        TF.ASTC_RGB_4x4: TF.ASTC_RGBA_4x4,
+        TF.ASTC_RGB_5x5: TF.ASTC_RGBA_5x5,
+        TF.ASTC_RGB_6x6: TF.ASTC_RGBA_6x6,
+        TF.ASTC_RGB_8x8: TF.ASTC_RGBA_8x8,
+    }
+    qualities = ["fast", "normal", "best"]
+
+    def __init__(self, format: str = "RGBA32", quality: str = "normal", strip: int = 256):
+        assert format == "original" or format in self.formats, f"Unknown texture format: {format}"
+        assert quality in self.qualities, f"Unknown quality preset: {quality}"
+        self.format = format
+        self.quality = quality
+        self.strip = strip
+
+    def target(self, original: TF) -> TF:
+        if self.format != "original":
+            return self.formats[self.format]
+        original = self.aliases.get(original, original)
+        return original if original in self.formats.values() else TF.RGBA32
+
+    @staticmethod
+    def block(format: TF) -> tuple[int, int]:
+        if format == TF.RGBA32:
+            return 1, 1
+        if format.name.startswith("ASTC"):
+            w, h = format.name.split("_")[-1].split("x")
+            return int(w), int(h)
+        return 4, 4
+
+    @staticmethod
+    def compress(data: bytes, width: int, height: int, format: TF, quality: str) -> bytes:
+        if format.name.startswith("ASTC"):
+            import astc_encoder as astc
+
+            presets = {
+                "fast": astc.ASTCQualityPreset.FAST,
+                "normal": astc.ASTCQualityPreset.MEDIUM,
+                "best": astc.ASTCQualityPreset.THOROUGH,
+            }
+            bw, bh = TextureEncoder.block(format)
+            config = astc.ASTCConfig(astc.ASTCProfile.LDR, bw, bh, 1, presets[quality])
+            image = astc.ASTCImage(astc.ASTCType.U8, width, height, 1, data)
+            return astc.ASTCContext(config).compress(image, astc.ASTCSwizzle.from_str("rgba"))
+
+        import etcpak
+
+        if format == TF.BC7:
+            params = etcpak.BC7CompressBlockParams()
+            params.m_uber_level = {"fast": 0, "normal": 1, "best": 4}[quality]
+            return etcpak.compress_bc7(data, width, height, params)
+
+        funcs = {
+            TF.ETC_RGB4: etcpak.compress_etc1_rgb,
+            TF.ETC2_RGB: etcpak.compress_etc2_rgb,
+            TF.ETC2_RGBA8: etcpak.compress_etc2_rgba,
+            TF.DXT1: etcpak.compress_bc1,
+            TF.DXT5: etcpak.compress_bc3,
+        }
+        return funcs[format](data, width, height)
+
+    def split(self, img: Image.Image, format: TF) -> list[tuple[bytes, int, int]]:
+        data = np.asarray(img.convert("RGBA"))
+        bw, bh = self.block(format)
+        h, w = data.shape[:2]
+        data = np.pad(data, ((0, -h % bh), (0, -w % bw), (0, 0)))
+        rows = max(1, self.strip // bh) * bh
+        return [
+            (data[i : i + rows].tobytes(), data.shape[1], len(data[i : i + rows])) for i in range(0, len(data), rows)
+        ]
+
+    def submit(self, img: Image.Image, original: TF, executor: Executor = None) -> tuple[list, TF, tuple[int, int]]:
+        format = self.target(original)
+        if format == TF.RGBA32:
+            data = img.convert("RGBA").tobytes()
+            return [data], format, img.size
+        strips = self.split(img, format)
+        if executor is None:
+            return [self.compress(*x, format, self.quality) for x in strips], format, img.size
+        return [executor.submit(self.compress, *x, format, self.quality) for x in strips], format, img.size
+
+    @staticmethod
+    def join(job: tuple[list, TF, tuple[int, int]]) -> Encoded:
+        parts, format, size = job
+        return b"".join([x.result() if isinstance(x, Future) else x for x in parts]), format, size
+
+    def encode(self, img: Image.Image, original: TF) -> Encoded:
+        return self.join(self.submit(img, original))
+
+    @staticmethod
+    def apply(tex2d: Texture2D, encoded: Encoded):
+        data, format, size = encoded
+        tex2d.m_Width, tex2d.m_Height = size
+        if tex2d.version[:2] < (5, 2):
+            tex2d.m_MipMap = False
+        else:
+            tex2d.m_MipCount = 1
+        tex2d.image_data = data
+        tex2d.m_CompleteImageSize = len(data)
+        tex2d.m_TextureFormat = format
+        tex2d.save()
@@ -0,0 +1,43 @@
+import io
+import json
+from concurrent.futures import Future
+
+from PIL import Image, TiffImagePlugin
+
+from .LayerWriter import LayerWriter
+
+
+def encode_tiff(img: Image.Image, description: str) -> bytes:
+    with io.BytesIO() as buf:
+        img.save(buf, "TIFF", compression="tiff_adobe_deflate", description=description)
+        return buf.getvalue()
+
+
+class TiffWriter(LayerWriter):
+    ext = ".tiff"
+
+    def __init__(self, path: str, num_workers: int = None):
+        super().__init__(path, num_workers)
+        self.tiff = TiffImagePlugin.AppendingTiffWriter(path, True)
+
+    def submit(self, img: Image.Image, record: dict) -> Future:
+        return self.executor.submit(self.encode, img, record)
+
+    def encode(self, img: Image.Image, record: dict) -> bytes:
+        top, left, bottom, right = record["box"]
+        info = {"name": record["name"], "group": record["group"], "visible": record["visible"], "x": left, "y": top}
+        info |= {"width": right - left, "height": bottom - top}
+        return encode_tiff(self.placeholder(img), json.dumps(info))
+
+    def write(self, record: dict):
+        if record["kind"] == "layer":
+            self.tiff.write(record["data"])
+            self.tiff.newFrame()
+
+    def release(self):
+        if not self.tiff.f.closed:
+            self.tiff.close()
+
+    def close(self):
+        super().close()
+        self.release()
@@ -1,13 +1,30 @@
-import functools
+import contextlib
+import json
+import multiprocessing
 import os
 import re
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
 
+import numpy as np
 from PIL import Image
 from UnityPy import Environment
 
+from .ObjectIndex import ObjectIndex
 
-def prod(x):
-    return functools.reduce(lambda a, b: a * b, x, 1)
+
+def cache_path(*name: str) -> str:
+    return os.path.join(os.environ.get("ALTH_CACHE_DIR", "cache"), *name)
+
+
+def configure_cache(root: str = None, texture: bool = None):
+    if root is not None:
+        os.environ["ALTH_CACHE_DIR"] = root
+    if texture is not None:
+        os.environ["ALTH_TEXTURE_CACHE"] = "1" if texture else "0"
 
 
 def raw_name(path: str) -> str:
@@ -21,20 +38,134 @@ def check_dir(*dir):
         os.mkdir(os.path.join(*dir))
 
 
+def open_img(filename: str) -> Image.Image:
+    if os.path.splitext(filename)[1].lower() == ".npy":
+        return Image.fromarray(np.load(filename, mmap_mode="r"))
+    return Image.open(filename)
+
+
+def write_img(img: Image.Image, filename: str):
+    if os.path.splitext(filename)[1].lower() == ".npy":
+        np.save(filename, np.asarray(img))
+    else:
+        img.save(filename)
+
+
 def read_img(filename: str, resize: tuple[int, int] = None, no_ext: bool = False) -> Image.Image:
     if no_ext:
         filename += ".png"
-    img = Image.open(filename).transpose(Image.FLIP_TOP_BOTTOM)
+    img = open_img(filename).transpose(Image.FLIP_TOP_BOTTOM)
     if resize is not None:
         img = img.resize(resize, Image.Resampling.LANCZOS)
     return img
 
 
+def read_region(filename: str, box: tuple[float, float, float, float]) -> Image.Image:
+    img = open_img(filename)
+    x0, y0, x1, y1 = [round(_) for _ in box]
+    w, h = img.size
+    rows = min(h, h - y0)
+    if img.format == "PNG" and len(img.tile) == 1 and not img.info.get("interlace") and 0 < rows < h:
+        codec, _, offset, args = img.tile[0][:4]
+        img.tile = [(codec, (0, 0, w, rows), offset, args)]
+        img._size = (w, rows)
+    return img.crop((x0, h - y1, x1, h - y0)).transpose(Image.FLIP_TOP_BOTTOM)
+
+
 def save_img(img: Image.Image, filename: str, no_ext=False):
     if no_ext:
         filename += ".png"
-    img.transpose(Image.FLIP_TOP_BOTTOM).save(filename)
+    write_img(img.transpose(Image.FLIP_TOP_BOTTOM), filename)
+
+
+def filter_env(env: Environment, type: type, read: bool = True, file: str = None):
+    index = ObjectIndex.of(env)
+    return [index.read(_) if read else _ for _ in index.objects(type, file)]
+
+
+def find_env(env: Environment, type: type, name: str, file: str = None):
+    return ObjectIndex.of(env).get(type, name, file)
+
+
+def run_batch(
+    worker: Callable, tasks: dict[str, tuple], num_workers: int = None, quiet: bool = False
+) -> dict[str, dict]:
+    results = {}
+    suspects = _run_pool(worker, tasks, num_workers, quiet, results, len(tasks))
+    for k in suspects:
+        if _run_pool(worker, {k: tasks[k]}, 1, quiet, results, len(tasks)):
+            error = "BrokenProcessPool: worker process terminated abruptly"
+            _log_task(k, {"output": None, "error": error, "elapsed": 0.0}, results, len(tasks))
+    return {k: results[k] for k in tasks}
+
+
+def _run_pool(
+    worker: Callable, tasks: dict[str, tuple], num_workers: int, quiet: bool, results: dict[str, dict], total: int
+) -> list[str]:
+    """Run tasks, rebuilding the pool whenever a worker dies; return the tasks that were running at a crash."""
+    suspects = []
+    pending = dict(tasks)
+    while pending:
+        started = multiprocessing.SimpleQueue()
+        with ProcessPoolExecutor(num_workers, initializer=_init_worker, initargs=(started,)) as executor:
+            futures = {executor.submit(_run_task, worker, args, quiet, k): k for k, args in pending.items()}
+            for future in as_completed(futures):
+                try:
+                    _log_task(futures[future], future.result(), results, total)
+                except BrokenProcessPool:
+                    pass
+        running = set()
+        while not started.empty():
+            running.add(started.get())
+        lost = [k for k in pending if k not in results]
+        crashed = [k for k in lost if k in running] or lost
+        suspects += crashed
+        pending = {k: pending[k] for k in lost if k not in crashed}
+    return suspects
+
+
+def _log_task(name: str, res: dict, results: dict[str, dict], total: int):
+    results[name] = res
+    if res["error"] is None:
+        print(f"[INFO] ({len(results)}/{total}) {name}: {res['elapsed']:.2f}s")
+    else:
+        print(f"[ERROR] ({len(results)}/{total}) {name}: {res['error']}")
+
+
+_started = None
+
+
+def _init_worker(started):
+    global _started
+    _started = started
+
+
+def _run_task(worker: Callable, args: tuple, quiet: bool, name: str = None) -> dict:
+    if _started is not None:
+        _started.put(name)
+    start = time.perf_counter()
+    try:
+        if quiet:
+            with open(os.devnull, "w") as f, contextlib.redirect_stdout(f):
+                output = worker(*args)
+        else:
+            output = worker(*args)
+        error = None
+    except Exception as e:
+        output = None
+        error = f"{type(e).__name__}: {e}"
+        if not quiet:
+            traceback.print_exc()
+    return {"output": output, "error": error, "elapsed": time.perf_counter() - start}
 
 
-def filter_env(env: Environment, type: type, read: bool = True):
-    return [_.read() if read else _ for _ in env.objects if _.type.name == type.__name__]
+def write_report(results: dict[str, dict], path: str = None):
+    failed = {k: v for k, v in results.items() if v["error"] is not None}
+    elapsed = sum([v["elapsed"] for v in results.values()])
+    print(f"[INFO] Succeeded: {len(results) - len(failed)}/{len(results)} ({elapsed:.2f}s in total)")
+    for k, v in failed.items():
+        print("      ", k, "->", v["error"])
+    if path is not None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    return len(failed) == 0
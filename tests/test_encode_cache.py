@@ -0,0 +1,21 @@
+import os
+
+from src.EncodeCache import EncodeCache
+
+
+def test_evict(tmp_path):
+    store = EncodeCache(str(tmp_path / "cache"), 3000)
+    keys = [f"{i:02x}" * 20 for i in range(4)]
+    output = str(tmp_path / "output")
+    for i, key in enumerate(keys):
+        with open(output, "wb") as f:
+            f.write(bytes([i]) * 1000)
+        store.put(key, output)
+        if i < 3:
+            os.utime(store.file(key), (i + 1, i + 1))
+        if i == 2:
+            assert store.get(keys[0], output)
+            os.utime(store.file(keys[0]), (10, 10))
+    assert store.usage == 2000
+    assert [os.path.exists(store.file(x)) for x in keys] == [True, False, False, True]
+    assert store.get(keys[3], output) and open(output, "rb").read() == bytes([3]) * 1000
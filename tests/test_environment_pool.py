@@ -0,0 +1,33 @@
+import types
+
+from src import EnvironmentPool as module
+from src.EnvironmentPool import EnvironmentPool
+
+
+class FakeEnv:
+    def __init__(self, path: str):
+        self.files = {}
+        self.load_file(path)
+
+    def load_file(self, path: str):
+        with open(path, "rb") as f:
+            self.files[path] = types.SimpleNamespace(reader=types.SimpleNamespace(Length=4 * len(f.read())))
+
+
+def test_shared_dependency(tmp_path, monkeypatch):
+    loads = []
+    monkeypatch.setattr(module.UnityPy, "load", lambda x: loads.append(x) or FakeEnv(x))
+    meta, dep, other = [str(tmp_path / x) for x in ["meta", "dep", "other"]]
+    for x in [meta, dep, other]:
+        open(x, "wb").write(b"\0" * 100)
+
+    pool = EnvironmentPool(1000)
+    env = pool.attach(meta, dep)
+    assert pool.usage() == 800
+    with pool.borrow(dep) as borrowed:
+        assert borrowed is env and pool.name(env, dep) == dep
+    assert loads == [meta] and pool.get(meta) is env
+
+    pool.get(other)
+    assert pool.get(other) is not env and pool.usage() == 400
+    assert pool.get(meta) is not env and loads == [meta, other, meta]
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.PsdWriter import PsdWriter
+
+psd_tools = pytest.importorskip("psd_tools")
+
+
+def layer(w: int, h: int, seed: int) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    data = rng.integers(0, 256, (h, w, 4), dtype=np.uint8)
+    data[: h // 2, : w // 2] = 0
+    data[h // 2 :, w // 2 :] = (10, 20, 30, 255)
+    return Image.fromarray(data)
+
+
+@pytest.mark.parametrize("compression", ["rle", "raw"])
+def test_round_trip(tmp_path, compression):
+    path = str(tmp_path / "test.psd")
+    body, face = layer(300, 260, 0), layer(80, 70, 1)
+    with PsdWriter(path, 2, compression) as writer:
+        writer.add_layer(body, "body", 0, 0)
+        writer.begin_group("paintingface")
+        writer.add_layer(face, "1", 40, 50, False)
+        writer.end_group()
+        writer.close()
+
+    psd = psd_tools.PSDImage.open(path)
+    assert psd.size == (300, 260)
+    layers = {x.name: x for x in psd.descendants() if not x.is_group()}
+    assert np.array_equal(np.asarray(layers["body"].topil()), np.asarray(body))
+    assert np.array_equal(np.asarray(layers["1"].topil()), np.asarray(face))
+    assert (layers["1"].left, layers["1"].top) == (50, 40)
+    assert not layers["1"].visible
+    assert [x.name for x in psd if x.is_group()] == ["paintingface"]
+
+    with Image.open(path) as img:
+        img.load()
+        assert img.size == (300, 260)
+        img.seek(1)
+        img.load()
+
+
+def test_empty_layer(tmp_path):
+    path = str(tmp_path / "test.psd")
+    with PsdWriter(path) as writer:
+        writer.add_layer(layer(120, 100, 2), "body", 10, 10)
+        writer.begin_group("paintingface")
+        writer.add_layer(Image.new("RGBA", (400, 400)), "0", 0, 0, False)
+        writer.end_group()
+        writer.close()
+
+    psd = psd_tools.PSDImage.open(path)
+    assert psd.size == (120, 100)
+    layers = {x.name: x for x in psd.descendants() if not x.is_group()}
+    assert list(layers) == ["body", "0"]
+    assert layers["0"].size == (0, 0)
@@ -0,0 +1,33 @@
+import os
+
+from src.utility import run_batch
+
+
+def work(x: int) -> int:
+    if x < 0:
+        os._exit(1)
+    if x == 0:
+        raise ValueError("zero")
+    return x * 2
+
+
+def test_job_error():
+    results = run_batch(work, {"a": (1,), "b": (0,)}, 1, True)
+    assert results["a"]["output"] == 2 and results["a"]["error"] is None
+    assert results["b"]["error"] == "ValueError: zero"
+
+
+def test_worker_crash():
+    results = run_batch(work, {"a": (-1,), "b": (2,)}, 1, True)
+    assert list(results) == ["a", "b"]
+    assert results["a"]["error"].startswith("BrokenProcessPool")
+    assert results["b"]["output"] == 4 and results["b"]["error"] is None
+
+
+def test_worker_crash_isolated():
+    tasks = {"a": (-1,)} | {f"j{i}": (i + 1,) for i in range(12)}
+    for n in [1, 4]:
+        results = run_batch(work, tasks, n, True)
+        assert list(results) == list(tasks)
+        assert results["a"]["error"].startswith("BrokenProcessPool")
+        assert all([results[f"j{i}"]["output"] == 2 * (i + 1) for i in range(12)])
@@ -0,0 +1,35 @@
+import os
+
+from PIL import Image
+
+from src.TextureCache import TextureCache
+from src.utility import configure_cache
+
+
+class FakeTexture:
+    image_data = b"\1" * 16
+    m_TextureFormat, m_Width, m_Height = 4, 2, 2
+
+    def __init__(self):
+        self.decoded = 0
+
+    @property
+    def image(self) -> Image.Image:
+        self.decoded += 1
+        return Image.new("RGBA", (2, 2))
+
+
+def test_configure(tmp_path, monkeypatch):
+    monkeypatch.setenv("ALTH_CACHE_DIR", "")
+    monkeypatch.setenv("ALTH_TEXTURE_CACHE", "1")
+    tex2d = FakeTexture()
+    store = TextureCache("texture")
+
+    configure_cache(str(tmp_path), False)
+    store.get(tex2d), store.get(tex2d)
+    assert tex2d.decoded == 2 and not os.path.exists(store.path)
+
+    configure_cache(texture=True)
+    store.get(tex2d), store.get(tex2d)
+    assert tex2d.decoded == 3 and os.path.exists(store.file(store.key(tex2d)))
+    assert store.path == os.path.join(str(tmp_path), "texture")
@@ -0,0 +1,48 @@
+import types
+
+import numpy as np
+from PIL import Image
+
+from src.AssetManager import untrim
+from src.DecodeHelper import warp
+from src.EncodeHelper import mesh_buffers, pack_tiles, trim_face
+from src.Layer import Layer
+
+
+def sparse_image(w: int, h: int, box: tuple[int, int, int, int]) -> Image.Image:
+    data = np.random.default_rng(0).integers(0, 256, (h, w, 4), np.uint8)
+    mask = np.zeros((h, w), bool)
+    mask[box[1] : box[3], box[0] : box[2]] = True
+    data[..., 3] = 255
+    data[~mask] = 0
+    return Image.fromarray(data, "RGBA")
+
+
+def test_face_round_trip():
+    full = sparse_image(120, 90, (17, 8, 71, 59))
+    img, (w, h, x, y) = trim_face(full.transpose(Image.FLIP_TOP_BOTTOM))
+    assert img.size == (54, 51)
+
+    rect = types.SimpleNamespace(x=0, y=0, width=img.width, height=img.height)
+    sprite = types.SimpleNamespace(
+        m_Rect=types.SimpleNamespace(width=w, height=h),
+        m_RD=types.SimpleNamespace(textureRect=rect, textureRectOffset=types.SimpleNamespace(X=x, Y=y)),
+    )
+    decoded = untrim(img.transpose(Image.FLIP_TOP_BOTTOM), sprite)
+    assert np.array_equal(np.asarray(decoded), np.asarray(full))
+
+
+def test_painting_round_trip():
+    full = sparse_image(300, 200, (40, 30, 170, 120))
+    img, quads = pack_tiles(full.transpose(Image.FLIP_TOP_BOTTOM), (4, 4))
+    assert img.width * img.height < full.width * full.height
+
+    buf, idx = mesh_buffers(quads, *img.size)
+    vertices = np.asarray(buf).reshape(-1, 5)
+    layer = Layer.__new__(Layer)
+    layer.m_Texture2D = types.SimpleNamespace(m_Width=img.width, m_Height=img.height)
+    layer.m_Mesh = types.SimpleNamespace(
+        m_Vertices=vertices[:, :3].ravel().tolist(), m_UV0=vertices[:, 3:].ravel().tolist(), m_Indices=idx
+    )
+    decoded = warp(img.transpose(Image.FLIP_TOP_BOTTOM), *layer.meshArrays, full.size, full.size)
+    assert np.array_equal(np.asarray(decoded), np.asarray(full))